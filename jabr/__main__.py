@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+
+import sys
+
+from jabr import cli
+
+if __name__ == "__main__":
+    if getattr(sys, 'frozen', False):
+        # Lets frozen builds start the worker processes of jabr.parallel
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(cli.main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+
+import argparse
+import itertools
+import os
+import stat
+import sys
+
+from jabr.main import JABR
+from jabr.parallel import ParallelTransformer
+from jabr.pipeline import Stage
+from jabr.preview import iter_newnames
+from jabr.walk import walk
+
+FILEPARTS = { 'name': 'base', 'ext': 'ext', 'full': 'fullname' }
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='jabr',
+        description='Renames files in bulk with one of the JABR modules, '
+                    'printing the new names unless --execute is given.'
+    )
+    parser.add_argument('module', nargs='?', help='the module to rename with, by label or file name, see --list')
+    parser.add_argument('paths', nargs='*', help='the files to rename')
+    parser.add_argument('-o', '--option', action='append', default=[], metavar='KEY=VALUE',
+                        help='sets an option of the module, e.g. -o "leading zeros=2" or -o from="From the Right"')
+    parser.add_argument('-f', '--files-from', metavar='FILE',
+                        help='reads the files to rename from FILE, or from stdin if FILE is -, one per line')
+    parser.add_argument('-0', '--null', action='store_true',
+                        help='separates the files read & the names printed with NUL instead of newlines')
+    parser.add_argument('-p', '--part', choices=('name', 'ext', 'full'), default='name',
+                        help='the part of each file name to rename, the name without extension by default')
+    parser.add_argument('-r', '--recursive', action='store_true', help='renames the files in the directories given & their subdirectories')
+    parser.add_argument('--include', action='append', default=[], metavar='GLOB',
+                        help='with -r, only renames the files whose names match one of the globs')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='with -r, skips the files & directories whose names match the glob')
+    parser.add_argument('--max-depth', type=int, metavar='DEPTH',
+                        help='with -r, only goes DEPTH directories below the ones given')
+    parser.add_argument('--hidden', action='store_true', help='with -r, renames hidden files too')
+    parser.add_argument('-x', '--execute', action='store_true', help='renames the files')
+    parser.add_argument('--progress', action='store_true', help='reports the number of files read on stderr')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='the number of threads renaming files')
+    parser.add_argument('-l', '--list', action='store_true', help='lists the modules & their options')
+    parser.add_argument('--gui', action='store_true', help='starts the GUI')
+    return parser
+
+def get_module(mods, name):
+    """ Returns the module whose label or file name is name, ignoring case """
+    name = name.lower()
+    for label, entry in mods.items():
+        modname = entry['name'].lower()
+        if name in (label.lower(), modname, modname.replace('_', '-'), modname.replace('_', ' ')):
+            return entry['object']
+    raise ValueError('there is no module named {0}, see --list'.format(name))
+
+def get_config(mod, options):
+    """ Returns the config set by KEY=VALUE options, where KEY is one of
+        the module's options and VALUE one of its choices or any text
+    """
+    available = mod.get_options()
+    config = {}
+    for option in options:
+        key, sep, value = option.partition('=')
+        if not sep:
+            raise ValueError('{0} is not KEY=VALUE'.format(option))
+        if key not in available:
+            key = key.replace('_', ' ').replace('-', ' ')
+        if key not in available:
+            raise ValueError('{0} has no option {1}, see --list'.format(mod.LABEL, key))
+        choices = available[key]
+        if isinstance(choices, dict):
+            values = { str(v): v for v in choices.values() }
+            values.update((k.lower(), v) for k, v in choices.items())
+            if value.lower() not in values:
+                raise ValueError('{0} must be one of: {1}'.format(key, ', '.join(choices)))
+            value = values[value.lower()]
+        config[key] = value
+    return config
+
+def iter_paths(stream, null=False, chunksize=65536):
+    """ Yields the paths in a binary stream as they are read,
+        decoded like the filesystem does
+    """
+    separator = b'\0' if null else b'\n'
+    read = getattr(stream, 'read1', stream.read)
+    rest = b''
+    while True:
+        data = read(chunksize)
+        paths = (rest + data).split(separator)
+        rest = paths.pop() if data else b''
+        for p in paths:
+            if not null:
+                p = p.rstrip(b'\r')
+            if p:
+                yield os.fsdecode(p)
+        if not data:
+            return
+
+def write_plan(out, files, newnames, null=False):
+    """ Writes the old & new path of each file that gets a new name
+        as the new names come, newnames being any iterable
+    """
+    for f, n in zip(files, newnames):
+        if not n:
+            continue
+        oldpath = os.fsencode(f['fullpath'])
+        newpath = os.fsencode(os.path.join(f['dirpath'], n))
+        if null:
+            out.write(b''.join([oldpath, b'\0', newpath, b'\0']))
+        else:
+            out.write(b''.join([oldpath, b' -> ', newpath, b'\n']))
+    out.flush()
+
+def show_progress(read, added):
+    sys.stderr.write('\rRead {0} paths, {1} files added'.format(read, added))
+    sys.stderr.flush()
+
+def list_modules(mods, out):
+    for label in sorted(mods):
+        mod = mods[label]['object']
+        defaults = mod.get_config()
+        out.write('{0}\n'.format(label))
+        for key, choices in mod.get_options().items():
+            default = defaults.get(key, '')
+            if isinstance(choices, dict):
+                default = next((k for k, v in choices.items() if v == default), default)
+                choices = ', '.join(choices)
+            out.write('    {0}: {1} (default: {2})\n'.format(key, choices, default))
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_intermixed_args(argv)
+    if args.gui:
+        from jabr import main
+        main.start()
+        return 0
+
+    jabr = JABR()
+    if args.list:
+        list_modules(jabr.mods, sys.stdout)
+        return 0
+    if not args.module:
+        parser.error('a module is required, see --list')
+
+    try:
+        mod = get_module(jabr.mods, args.module)
+        stage = Stage(mod, get_config(mod, args.option))
+    except ValueError as e:
+        parser.error(str(e))
+    if not mod.validate_config(stage.config):
+        parser.error('the options are not valid for {0}, see --list'.format(mod.LABEL))
+
+    stream = None
+    if args.files_from == '-' or (args.files_from is None and not args.paths and not sys.stdin.isatty()):
+        stream = sys.stdin.buffer
+    elif args.files_from is not None:
+        stream = open(args.files_from, 'rb')
+    paths = args.paths if stream is None else itertools.chain(args.paths, iter_paths(stream, args.null))
+
+    missing = []
+    def onerror(e):
+        sys.stderr.write('jabr: {0}\n'.format(e))
+        missing.append(e.filename)
+
+    files = jabr.files
+    def get_entries(paths):
+        for path in paths:
+            p = os.path.abspath(path)
+            # Stat'ed once, adding the file takes the result from files.stats
+            st = files.stats.get(p)
+            if st is None and not os.path.lexists(p):
+                files.stats.pop(p)
+                sys.stderr.write('jabr: {0}: No such file\n'.format(path))
+                missing.append(path)
+                continue
+            if args.recursive and st is not None and stat.S_ISDIR(st.st_mode):
+                for entry in walk(p, args.include, args.exclude, args.max_depth, args.hidden, onerror):
+                    yield entry
+            else:
+                dirpath, name = os.path.split(p)
+                yield dirpath, name, p, None
+
+    try:
+        files.add_entries(get_entries(paths), progress=show_progress if args.progress else None)
+    finally:
+        if stream is not None and stream is not sys.stdin.buffer:
+            stream.close()
+    if args.progress:
+        sys.stderr.write('\n')
+    status = 1 if missing else 0
+
+    stage.prepare(files.list, files.sortkeys, files.version)
+    with ParallelTransformer() as transformer:
+        newnames = iter_newnames(files.list, transformer.bind(stage), FILEPARTS[args.part], stage.POSITIONAL)
+        if not args.execute:
+            write_plan(sys.stdout.buffer, files.list, newnames, args.null)
+            return status
+        newnames = list(newnames)
+
+    files.workers = args.jobs
+    output = files.rename(newnames)
+    if output['errormsg']:
+        sys.stderr.write('jabr: {0}\n{1}\n'.format(output['errormsg'], output['errorlog'].rstrip('\n')))
+        return 1
+    return status
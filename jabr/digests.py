@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+import hashlib
+import os
+
+from jabr.statcache import StatCache
+
+# Matches hashlib.file_digest, larger buffers were no faster
+BUFSIZE = 256 * 1024
+FILENAME = 'digests.sqlite3'
+
+def get_cache_dir():
+    """ Returns the directory JABR keeps its caches in, under XDG_CACHE_HOME
+        or ~/.cache, or under LOCALAPPDATA on Windows
+    """
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'jabr')
+
+def get_key(st):
+    """ Returns the key a file's digest is cached by, which changes when
+        the file is written to or replaced
+    """
+    return '{0}:{1}:{2}:{3}'.format(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+def hash_file(path, algorithm):
+    """ Returns (key, hex digest) of a file's content, the key being read
+        from the file that was opened
+
+        The file is read into one buffer that is reused, hashlib releasing
+        the GIL while it hashes each chunk so that several files can be
+        hashed at once on threads. Memory mapping it would turn a read
+        error or the file being truncated into a SIGBUS.
+    """
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(BUFSIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        fd = f.fileno()
+        key = get_key(os.fstat(fd))
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return key, digest.hexdigest()
+
+def _hash_file(path, algorithm):
+    try:
+        return hash_file(path, algorithm)
+    except OSError:
+        return None, None
+
+class DigestCache:
+    """ Keeps the digests of files by their (st_dev, st_ino, st_size,
+        st_mtime_ns) & algorithm, for the session and in an sqlite database
+        at path, so that the same content is only hashed once across runs
+
+        The database is left out if sqlite3 is missing or path cannot be
+        written to. hashed counts the files hashed.
+    """
+    def __init__(self, path=None):
+        self.path = path if path is not None else os.path.join(get_cache_dir(), FILENAME)
+        self.hashed = 0
+        self._digests = {}
+
+    def _connect(self):
+        try:
+            import sqlite3
+        except ImportError:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('CREATE TABLE IF NOT EXISTS digests (key TEXT PRIMARY KEY, digest TEXT) WITHOUT ROWID')
+        except (OSError, sqlite3.Error):
+            return None
+        return db
+
+    def _read(self, db, keys):
+        import sqlite3
+        found = {}
+        try:
+            for key in keys:
+                row = db.execute('SELECT digest FROM digests WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    found[key] = row[0]
+        except sqlite3.Error:
+            pass
+        return found
+
+    def _write(self, db, digests):
+        import sqlite3
+        try:
+            with db:
+                db.executemany('INSERT OR REPLACE INTO digests VALUES (?, ?)', digests.items())
+        except sqlite3.Error:
+            pass
+
+    def get(self, paths, algorithm, workers=4):
+        """ Returns the hex digest of each of the paths, None for those that
+            cannot be read, stat'ing & hashing files on workers threads
+
+            The files are stat'ed on every call, so that a file written to
+            since the last one gets a new key instead of its old digest.
+        """
+        stats = StatCache()
+        stats.prefetch(paths, workers)
+        keys = []
+        for p in paths:
+            st = stats.get(p)
+            keys.append('{0}:{1}'.format(algorithm, get_key(st)) if st is not None else None)
+
+        # One path for each key not cached for the session, hardlinks sharing theirs
+        missing = {}
+        for p, key in zip(paths, keys):
+            if key is not None and key not in self._digests:
+                missing.setdefault(key, p)
+        db = self._connect() if missing else None
+        if db is not None:
+            found = self._read(db, missing)
+            self._digests.update(found)
+            for key in found:
+                del missing[key]
+
+        if missing:
+            hashed = {}
+            results = self._hash(list(missing.values()), algorithm, workers)
+            for key, (filekey, digest) in zip(missing, results):
+                if digest is None:
+                    continue
+                self._digests[key] = digest
+                # The file may have changed since it was stat'ed
+                hashed['{0}:{1}'.format(algorithm, filekey)] = digest
+            self._digests.update(hashed)
+            self.hashed += len(missing)
+            if db is not None:
+                self._write(db, hashed)
+        if db is not None:
+            db.close()
+        return [self._digests.get(key) for key in keys]
+
+    def _hash(self, paths, algorithm, workers):
+        if workers < 2 or len(paths) < 2:
+            return [_hash_file(p, algorithm) for p in paths]
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            return list(pool.map(_hash_file, paths, [algorithm] * len(paths)))
+
+    def clear(self):
+        """ Forgets the digests of the session, the database is kept """
+        self._digests.clear()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+import os
+
+class DirIndex:
+    """ Keeps a set of entry names per directory so that candidate names
+        can be checked without listing the same directory over and over
+    """
+    def __init__(self):
+        self._dirs = {}
+
+    def _get_stamp(self, dirpath):
+        st = os.stat(dirpath)
+        return (st.st_dev, st.st_ino, st.st_mtime_ns)
+
+    def names(self, dirpath):
+        """ Returns the set of entry names in dirpath, rescanning it
+            only if its device, inode or mtime changed since the last scan
+        """
+        # The stamp is taken before scanning so that a change made
+        # during the scan invalidates the entry on the next lookup
+        stamp = self._get_stamp(dirpath)
+        cached = self._dirs.get(dirpath)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with os.scandir(dirpath) as entries:
+            names = {e.name for e in entries}
+        self._dirs[dirpath] = (stamp, names)
+        return names
+
+    def conflicts(self, dirpath, names):
+        """ Returns the names in the given iterable that already exist in dirpath """
+        existing = self.names(dirpath)
+        return [n for n in names if n in existing]
+
+    def invalidate(self, dirpath=None):
+        if dirpath is None:
+            self._dirs.clear()
+        else:
+            self._dirs.pop(dirpath, None)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+import collections
+import os
+
+from jabr import fsops
+
+STATS = ('syscalls', 'lookups', 'saved_syscalls', 'saved_lookups')
+
+def count_lookups(path):
+    """ Returns the number of path components the kernel resolves for path """
+    return len([p for p in path.split(os.sep) if p])
+
+class Executor:
+    """ Runs the chains of a rename plan one after another
+
+        With dirfd set, every directory that holds more than one rename
+        is opened once and its chains are run relative to it, so each
+        rename resolves two bare names instead of two full paths.
+    """
+    def __init__(self, fs=None, dirfd=False):
+        self.fs = fs if fs is not None else fsops.FileSystem()
+        self.dirfd = dirfd
+        self.stats = {}
+
+    def _get_groups(self, plan):
+        """ Yields (dirpath, chains) where dirpath is None if the chains
+            have to be run with full paths
+        """
+        if not self.dirfd:
+            yield None, plan.chains
+            return
+
+        groups = {}
+        for chain in plan.chains:
+            groups.setdefault(os.path.dirname(chain[0][1]), []).append(chain)
+        for dirpath, chains in groups.items():
+            steps = [s for c in chains for s in c]
+            if len(steps) < 2 or any(os.path.dirname(p) != dirpath for s in steps for p in s[1:]):
+                yield None, chains
+            else:
+                yield dirpath, chains
+
+    def _new_result(self):
+        return { 'errors': {}, 'parked': {}, 'stats': dict.fromkeys(STATS, 0) }
+
+    def _merge_result(self, result, other):
+        result['errors'].update(other['errors'])
+        result['parked'].update(other['parked'])
+        for key in STATS:
+            result['stats'][key] += other['stats'][key]
+
+    def _open_dir(self, dirpath, stats):
+        if dirpath is None:
+            return None
+        try:
+            fd = self.fs.open_dir(dirpath)
+        except OSError:
+            return None
+        # open() and close() of the directory
+        stats['syscalls'] += 2
+        stats['saved_syscalls'] -= 2
+        stats['lookups'] += count_lookups(dirpath)
+        stats['saved_lookups'] -= count_lookups(dirpath)
+        return fd
+
+    def _rename(self, src, dst, fd, stats):
+        stats['syscalls'] += 1
+        fulllookups = count_lookups(src) + count_lookups(dst)
+        if fd is None:
+            stats['lookups'] += fulllookups
+            self.fs.rename(src, dst)
+            return
+        stats['lookups'] += 2
+        stats['saved_lookups'] += fulllookups - 2
+        self.fs.rename(os.path.basename(src), os.path.basename(dst), fd, fd)
+
+    def _restore(self, chain, plan, parked):
+        """ Moves a file parked under a temporary name by a failed chain
+            back to its original name, or records where it was left
+        """
+        row, src, tempname = chain[0]
+        if tempname not in plan.temps or chain[-1][1] != tempname:
+            return
+        if not os.path.lexists(tempname):
+            return
+        try:
+            self.fs.restore(tempname, src)
+        except OSError:
+            parked[row] = tempname
+
+    def _run_chains(self, chains, plan, fd):
+        result = self._new_result()
+        for chain in chains:
+            failed = False
+            for row, src, dst in chain:
+                if failed:
+                    result['errors'].setdefault(row, 'Blocked by a failed rename')
+                    continue
+                try:
+                    self._rename(src, dst, fd, result['stats'])
+                except OSError as e:
+                    result['errors'][row] = str(e)
+                    failed = True
+            if failed:
+                self._restore(chain, plan, result['parked'])
+        return result
+
+    def run(self, plan):
+        """ Runs the plan and returns the errors keyed by row
+            and the rows that were left under a temporary name
+
+            self.stats counts the rename related syscalls and path
+            components resolved, and how many fewer of each were needed
+            than renaming every file by its full path
+        """
+        result = self._new_result()
+        for dirpath, chains in self._get_groups(plan):
+            fd = self._open_dir(dirpath, result['stats'])
+            try:
+                self._merge_result(result, self._run_chains(chains, plan, fd))
+            finally:
+                if fd is not None:
+                    self.fs.close_dir(fd)
+        self.stats = result['stats']
+        return result['errors'], result['parked']
+
+class ThreadedExecutor(Executor):
+    """ Runs independent chains of a rename plan on a pool of threads
+
+        Meant for filesystems where every rename is a network round trip.
+        Chains never share a path, so they can run in any order while the
+        steps within a chain still run one after another. A directory
+        opened for dirfd renames is closed once all of its chains are done.
+    """
+    def __init__(self, fs=None, dirfd=False, workers=8, chunksize=16):
+        Executor.__init__(self, fs, dirfd)
+        self.workers = workers
+        self.chunksize = chunksize
+
+    def run(self, plan):
+        import concurrent.futures # Costs the CLI's start up if imported at the top
+        result = self._new_result()
+        pending = collections.deque()
+
+        def finish_group():
+            fd, futures = pending.popleft()
+            try:
+                for future in futures:
+                    self._merge_result(result, future.result())
+            finally:
+                if fd is not None:
+                    self.fs.close_dir(fd)
+
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            for dirpath, chains in self._get_groups(plan):
+                fd = self._open_dir(dirpath, result['stats'])
+                # Small groups are still spread over every worker
+                size = max(1, min(self.chunksize, -(-len(chains) // self.workers)))
+                futures = [
+                    pool.submit(self._run_chains, chains[i:i+size], plan, fd)
+                    for i in range(0, len(chains), size)
+                ]
+                pending.append((fd, futures))
+                # Bounds the number of directories held open at once
+                if len(pending) > self.workers * 2:
+                    finish_group()
+            while pending:
+                finish_group()
+        self.stats = result['stats']
+        return result['errors'], result['parked']
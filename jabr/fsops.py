@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import ctypes
+import errno
+import os
+import sys
+
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+
+_renameat2 = None
+_probed = False
+
+def _load_renameat2():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        func = ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError):
+        # glibc older than 2.28 has no wrapper for the system call
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    func.restype = ctypes.c_int
+    return func
+
+def has_noreplace():
+    """ Returns True if the kernel can refuse to overwrite a rename target,
+        which is probed once by renaming a path that does not exist
+    """
+    global _renameat2, _probed
+    if not _probed:
+        _probed = True
+        _renameat2 = _load_renameat2()
+        if _renameat2 is not None:
+            missing = os.fsencode(os.path.join(os.sep, 'nonexistent', str(os.getpid())))
+            if _renameat2(AT_FDCWD, missing, AT_FDCWD, missing + b'~', RENAME_NOREPLACE) != 0:
+                if ctypes.get_errno() == errno.ENOSYS:
+                    _renameat2 = None
+    return _renameat2 is not None
+
+def has_dirfd():
+    """ Returns True if renames can be made relative to open directories """
+    return os.rename in os.supports_dir_fd and hasattr(os, 'O_DIRECTORY')
+
+def lexists(path, dir_fd=None):
+    try:
+        os.lstat(path, dir_fd=dir_fd)
+    except FileNotFoundError:
+        return False
+    return True
+
+def rename_noreplace(src, dst, src_dir_fd=None, dst_dir_fd=None):
+    """ Renames src to dst and raises FileExistsError if dst exists
+
+        The check is atomic when renameat2 is available. Filesystems that
+        reject the RENAME_NOREPLACE flag fall back to checking dst first.
+    """
+    if has_noreplace():
+        result = _renameat2(
+            AT_FDCWD if src_dir_fd is None else src_dir_fd,
+            os.fsencode(src),
+            AT_FDCWD if dst_dir_fd is None else dst_dir_fd,
+            os.fsencode(dst),
+            RENAME_NOREPLACE
+        )
+        if result == 0:
+            return
+        err = ctypes.get_errno()
+        if err != errno.EINVAL:
+            raise OSError(err, os.strerror(err), src, None, dst)
+    if lexists(dst, dst_dir_fd):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), src, None, dst)
+    os.rename(src, dst, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+
+class FileSystem:
+    """ The filesystem calls used to carry out a rename plan """
+    def __init__(self, noreplace=None):
+        self.noreplace = has_noreplace() if noreplace is None else noreplace
+
+    def rename(self, src, dst, src_dir_fd=None, dst_dir_fd=None):
+        if self.noreplace:
+            rename_noreplace(src, dst, src_dir_fd, dst_dir_fd)
+        else:
+            os.rename(src, dst, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+
+    def restore(self, src, dst):
+        """ Moves a file back to its original name without overwriting anything """
+        rename_noreplace(src, dst)
+
+    def open_dir(self, path):
+        return os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+
+    def close_dir(self, fd):
+        os.close(fd)
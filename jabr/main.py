@@ -1,16 +1,43 @@
 #!/usr/bin/env python
 
+import collections
 import datetime
-import importlib
+import itertools
 import os
 import sys
 
-from jabr.tkui import TkUI
+from jabr import executor
+from jabr import fsops
+from jabr import manifest
+from jabr import planner
+from jabr.dirindex import DirIndex
+from jabr.records import DirTable, FileRecord
+from jabr.sortkeys import SortKeys
+from jabr.statcache import FileStats, StatCache, get_identity
 
 class Files:
+    # Paths stat'ed ahead at a time when adding files on several threads
+    PREFETCH_SIZE = 4096
+
     def __init__(self):
         self.list = []
-        self._existingfiles = set()
+        self.version = 0
+        self.changes = collections.deque(maxlen=64)
+        # (st_dev, st_ino) of the files in self.list, so that the same file
+        # reached through a link or another path is only added once
+        self._identities = set()
+        # Paths of the files in self.list that have no identity
+        self._paths = set()
+        # Stats of the files being added, each dropped once it is claimed
+        self.stats = StatCache()
+        # What sorting needs of each file's stat, by row of self.list
+        self.filestats = FileStats()
+        self.sortkeys = SortKeys(stats=self.filestats)
+        self._dirs = DirTable()
+        self.dirindex = DirIndex()
+        self.noreplace = fsops.has_noreplace()
+        self.dirfd = fsops.has_dirfd()
+        self.workers = 1
 
     def __str__(self):
         if not len(self.list):
@@ -22,32 +49,157 @@ class Files:
         return output
 
     def add(self, files):
-        """ Adds the non-duplicate files into self.list & self._existingfiles
+        """ Adds the non-duplicate files into self.list
             then returns the files that were added
         """
-        files = [f for f in files if f not in self._existingfiles]
-        for f in files:
-            fullname = os.path.basename(f)
-            base, ext = os.path.splitext(fullname)
-            self._existingfiles.add(f)
-            self.list.append({
-                'fullname': fullname,
-                'base': base,
-                'ext': ext[1:],
-                'fullpath': f,
-                'dirpath': os.path.dirname(f)
-            })
-        return tuple(files)
+        addedfiles = []
+        start = len(self.list)
+        self._add(files, addedfiles)
+        if addedfiles:
+            self._log_change('add', range(start, len(self.list)))
+        return tuple(addedfiles)
+
+    def add_iter(self, files, batchsize=10000, progress=None, cancel=None):
+        """ Adds the non-duplicate files of an iterable of any length, such as
+            paths read from a pipe, batchsize at a time without holding on
+            to them, then returns the number of files that were added
+
+            progress, if given, is called after each batch with the number
+            of paths read & the number of files added so far. Adding stops
+            once cancel, a threading.Event, is set.
+        """
+        return self._add_batches(self._add, files, batchsize, progress, cancel)
+
+    def add_entries(self, entries, batchsize=10000, progress=None, cancel=None):
+        """ Like add_iter for (dirpath, fullname, fullpath, direntry) tuples
+            such as jabr.walk yields, which saves splitting each path and,
+            where direntry is an os.DirEntry rather than None, stat'ing it
+        """
+        return self._add_batches(self._add_entries, entries, batchsize, progress, cancel)
+
+    def _add_batches(self, add, files, batchsize, progress, cancel):
+        files = iter(files)
+        start = len(self.list)
+        read = 0
+        while cancel is None or not cancel.is_set():
+            batch = list(itertools.islice(files, batchsize))
+            if not batch:
+                break
+            read += len(batch)
+            add(batch)
+            if progress is not None:
+                progress(read, len(self.list) - start)
+        if len(self.list) > start:
+            self._log_change('add', range(start, len(self.list)))
+        return len(self.list) - start
+
+    def _add_entries(self, entries):
+        rawdirpath = dirpath = None
+        for d, fullname, fullpath, entry in entries:
+            if d != rawdirpath:
+                rawdirpath, dirpath = d, self._dirs.intern(d)
+            self._append(dirpath, fullname, fullpath, entry)
+        self.stats.clear()
+
+    def _add(self, files, addedfiles=None):
+        """ Appends a record for each of the files not in self.list yet
+            and, if addedfiles is given, the file to addedfiles
+        """
+        prefetch = self.workers > 1 and isinstance(files, (list, tuple))
+        for i, f in enumerate(files):
+            if prefetch and i % self.PREFETCH_SIZE == 0:
+                self.stats.prefetch(files[i:i+self.PREFETCH_SIZE], self.workers)
+            dirpath, fullname = os.path.split(f)
+            # Keyed on the path as the record derives it so that remove & rename find it
+            fullpath = os.path.join(dirpath, fullname)
+            if self._append(self._dirs.intern(dirpath), fullname, fullpath) and addedfiles is not None:
+                addedfiles.append(f)
+        self.stats.clear()
+
+    def _append(self, dirpath, fullname, fullpath, entry=None):
+        """ Appends a record for the file at fullpath, from its one stat,
+            unless a file in self.list has its identity, or its path if it
+            has none, then returns whether it was added
+        """
+        st = self.stats.pop(fullpath, entry)
+        identity = get_identity(st)
+        if identity is None:
+            if fullpath in self._paths:
+                return False
+            self._paths.add(fullpath)
+        elif identity in self._identities:
+            return False
+        else:
+            self._identities.add(identity)
+        self.list.append(FileRecord(dirpath, fullname, identity))
+        self.filestats.append(st)
+        return True
+
+    def _compact(self, mask):
+        """ Drops the files whose entry in mask is true in one pass
+            then returns the paths of the files that were removed
+        """
+        if len(mask) != len(self.list):
+            raise ValueError('Mask length does not match the number of files')
+        keptfiles = []
+        removedfiles = []
+        removedrows = []
+        for i, (remove, f) in enumerate(zip(mask, self.list)):
+            if remove:
+                removedfiles.append(f.fullpath)
+                removedrows.append(i)
+                if f.identity is None:
+                    self._paths.discard(removedfiles[-1])
+                else:
+                    self._identities.discard(f.identity)
+            else:
+                keptfiles.append(f)
+        self.list[:] = keptfiles
+        if removedfiles:
+            self.filestats.remove_mask(mask)
+            self._log_change('remove', tuple(removedrows))
+        return tuple(removedfiles)
 
     def remove(self, files):
-        files.sort()
-        for f in reversed(files):
-            self._existingfiles.discard(self.list[f]['fullpath'])
-            del self.list[f]
+        """ Removes the files at the given indices """
+        indices = set(files)
+        return self._compact([i in indices for i in range(len(self.list))])
+
+    def remove_mask(self, mask):
+        """ Removes the files whose entry in a sequence of booleans is true """
+        return self._compact(mask)
+
+    def remove_where(self, predicate):
+        """ Removes the files the predicate returns true for,
+            e.g. remove_where(lambda f: f['ext'] == 'bak')
+        """
+        return self._compact([predicate(f) for f in self.list])
 
     def clear(self):
         del self.list[:]
-        self._existingfiles.clear()
+        self._identities.clear()
+        self._paths.clear()
+        self.filestats.clear()
+        self.sortkeys.clear()
+        self._dirs.clear()
+        self._log_change('reset')
+
+    def _log_change(self, kind, rows=None):
+        self.version += 1
+        self.changes.append((self.version, kind, rows))
+
+    def get_changes(self, version):
+        """ Returns the (kind, rows) of each change made to self.list since
+            the given version, where kind is 'add' with the range of rows
+            appended or 'remove' with the rows removed, or None if some of
+            them were not logged or changed the list in any other way
+        """
+        changes = [(kind, rows) for v, kind, rows in self.changes if v > version]
+        if len(changes) != self.version - version:
+            return None
+        if any(kind == 'reset' for kind, _ in changes):
+            return None
+        return changes
 
     def rename(self, newnames):
         """ Renames the files and updates self.list if there are no conflicts
@@ -56,47 +208,88 @@ class Files:
         output = {
             'newoldnames': [],
             'errormsg': '',
-            'errorlog': ''
+            'errorlog': '',
+            'stats': {}
         }
 
-        dirpaths = set()
-        newnamesfullpaths = []
+        if len(newnames) != len(self.list):
+            output['errormsg'] = 'The new names do not match the files. No file has been renamed.'
+            output['errorlog'] = 'Expected {0} new names, got {1}'.format(len(self.list), len(newnames))
+            output['newoldnames'] = tuple(li['fullname'] for li in self.list)
+            return output
+
+        sources = []
+        targets = []
         for i, li in enumerate(self.list):
-            dirpaths.add(li['dirpath'])
-            newnamesfullpaths.append(os.path.join(li['dirpath'], newnames[i]))
+            sources.append(li['fullpath'])
+            targets.append(os.path.join(li['dirpath'], newnames[i]) if newnames[i] else None)
+        plan = planner.plan(sources, targets)
+
+        # With noreplace the kernel refuses to overwrite existing files,
+        # each one is reported as a failed rename instead of being looked up first
+        nameconflicts = set(plan.duplicates)
+        if not self.noreplace:
+            nameconflicts.update(self._get_nameconflicts(sources, targets))
+
+        if nameconflicts:
+            output['errormsg'] = 'Conflicts found. No file has been renamed.'
+            output['errorlog'] = 'List of files in conflict:\n'
+            output['errorlog'] += '\n'.join(str(nc) for nc in sorted(nameconflicts))
+            output['newoldnames'] = tuple(li['fullname'] for li in self.list)
+            return output
 
-        existingfullpaths = set()
-        for dp in dirpaths:
-            for ld in os.listdir(dp):
-                existingfullpaths.add(os.path.join(dp, ld))
-        nameconflicts = set(newnamesfullpaths).intersection(existingfullpaths)
+        if self.workers > 1:
+            runner = executor.ThreadedExecutor(fsops.FileSystem(self.noreplace), self.dirfd, self.workers)
+        else:
+            runner = executor.Executor(fsops.FileSystem(self.noreplace), self.dirfd)
+        errors, parked = runner.run(plan)
+        output['stats'] = runner.stats
+        for row, tempname in parked.items():
+            if sources[row] in self._paths:
+                self._paths.discard(sources[row])
+                self._paths.add(tempname)
+            self.list[row].fullname = os.path.basename(tempname)
 
-        failedrenames = []
+        oldpaths = []
+        newpaths = []
         for i, n in enumerate(newnames):
-            if bool(nameconflicts):
-                output['errormsg'] = 'Conflicts found. No file has been renamed.'
-                output['errorlog'] = 'List of files in conflict:\n'
-                output['errorlog'] = '\n'.join(str(nc) for nc in nameconflicts)
-                break
-            if not n:
-                output['newoldnames'].append(self.list[i]['fullname'])
-                continue
-            try:
-                os.rename(self.list[i]['fullpath'], newnamesfullpaths[i])
-            except OSError as e:
+            if i in errors:
                 output['errormsg'] = 'Error/s found. Check error.log for info.'
-                output['errorlog'] += '{0}: {1}\n'.format(str(e), self.list[i]['fullpath'])
+                output['errorlog'] += '{0}: {1}\n'.format(errors[i], sources[i])
+            if i in errors or targets[i] is None:
                 output['newoldnames'].append(self.list[i]['fullname'])
                 continue
-            output['newoldnames'].append(newnames[i])
-            base, ext = os.path.splitext(n)
-            self.list[i]['fullname'] = n
-            self.list[i]['base'] = base
-            self.list[i]['ext'] = ext[1:]
-            self.list[i]['fullpath'] = os.path.join(self.list[i]['dirpath'], n)
+            output['newoldnames'].append(n)
+            oldpaths.append(self.list[i]['fullpath'])
+            newpaths.append(targets[i])
+            self.list[i].fullname = n
+            self.dirindex.invalidate(self.list[i]['dirpath'])
+        moved = [(o, n) for o, n in zip(oldpaths, newpaths) if o in self._paths]
+        self._paths.difference_update(o for o, _ in moved)
+        self._paths.update(n for _, n in moved)
+        if newpaths or parked:
+            self._log_change('reset')
         output['newoldnames'] = tuple(output['newoldnames'])
         return output
 
+    def _get_nameconflicts(self, sources, targets):
+        """ Returns the targets that already exist and are not vacated by the batch """
+        # Names held by files in this batch are vacated by the plan,
+        # so only the remaining new names are looked up in each directory's index
+        vacated = {s for s, t in zip(sources, targets) if t is not None and t != s}
+        candidates = {}
+        for s, t in zip(sources, targets):
+            if t is None or t == s or t in vacated:
+                continue
+            dirpath, name = os.path.split(t)
+            candidates.setdefault(dirpath, []).append(name)
+
+        nameconflicts = set()
+        for dp, names in candidates.items():
+            for nc in self.dirindex.conflicts(dp, names):
+                nameconflicts.add(os.path.join(dp, nc))
+        return nameconflicts
+
 class JABR:
     def __init__(self):
         self.name = 'Just Another Bulk Renamer'
@@ -124,14 +317,8 @@ class JABR:
 
     def _load_mods(self, directory):
         sys.path.append(directory)
-        modlist = os.listdir(directory)
-        for m in modlist:
-            if not m.endswith(('.py', '.pyc')):
-                continue
-            mod = os.path.splitext(m)[0]
-            importedmod = importlib.import_module(mod)
-            if all(hasattr(importedmod, attr) for attr in ('LABEL', 'get_options', 'update_filenames')):
-                self.mods[importedmod.LABEL] = { 'object': importedmod }
+        # Modules are listed from the manifest & imported when first used
+        self.mods.update(manifest.load(directory))
 
     def logerror(self, log=''):
         with open('error.log', 'a') as errorlog:
@@ -149,8 +336,11 @@ class JABR:
         del self.mods[mod]
 
 def start():
+    # Tk is only loaded for the GUI so that the CLI & scripts start without it
+    from jabr.tkui import TkUI
     jabr = JABR()
     tkui = TkUI(None, jabr)
     tkui.title(jabr.name)
     tkui.minsize(480, 400)
     tkui.mainloop()
+    tkui.transformer.close()
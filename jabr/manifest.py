@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+import importlib
+import json
+import os
+
+from jabr import modapi
+
+# Kept in the modules directory, one entry per file:
+#
+#   { "version": 1, "files": { "insert.py": { "stamp": [mtime_ns, size], "label": "Insert" } } }
+#
+# label is null for files that are not modules. Files whose stamp changed
+# are imported again to read their label, the others are imported when used.
+FILENAME = '.manifest.json'
+VERSION = 1
+
+REQUIRED = ('LABEL', 'get_options', 'update_filenames')
+
+class ModEntry:
+    """ A module in JABR.mods, imported the first time entry['object'] is read
+
+        Entries read like the { 'object': module } dicts JABR.mods used to
+        hold, entry['name'] being the name the module is imported by.
+    """
+    def __init__(self, name, obj=None):
+        self.name = name
+        self._object = obj
+
+    def __getitem__(self, key):
+        if key == 'name':
+            return self.name
+        if key != 'object':
+            raise KeyError(key)
+        if self._object is None:
+            # Modules written before API version 2 are wrapped to look like one
+            self._object = modapi.adapt(importlib.import_module(self.name))
+        return self._object
+
+    @property
+    def loaded(self):
+        return self._object is not None
+
+def read(directory):
+    """ Returns the files recorded in directory's manifest, none if it is
+        missing, unreadable or written by another version
+    """
+    try:
+        with open(os.path.join(directory, FILENAME)) as manifest:
+            data = json.load(manifest)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != VERSION:
+        return {}
+    return data.get('files', {})
+
+def write(directory, files):
+    """ Replaces directory's manifest, if the directory can be written to """
+    path = os.path.join(directory, FILENAME)
+    temppath = '{0}.{1}.tmp'.format(path, os.getpid())
+    try:
+        with open(temppath, 'w') as manifest:
+            json.dump({ 'version': VERSION, 'files': files }, manifest, sort_keys=True)
+        os.replace(temppath, path)
+    except OSError:
+        try:
+            os.remove(temppath)
+        except OSError:
+            pass
+
+def load(directory):
+    """ Returns { LABEL: ModEntry } for the modules in directory, which has
+        to be on sys.path, importing only the files that are new or whose
+        modification time or size changed since the manifest was written
+    """
+    cached = read(directory)
+    files = {}
+    mods = {}
+    with os.scandir(directory) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if not entry.name.endswith(('.py', '.pyc')) or not entry.is_file():
+            continue
+        name = os.path.splitext(entry.name)[0]
+        info = entry.stat()
+        stamp = [info.st_mtime_ns, info.st_size]
+        record = cached.get(entry.name)
+        obj = None
+        if record is None or record.get('stamp') != stamp:
+            importedmod = importlib.import_module(name)
+            label = importedmod.LABEL if all(hasattr(importedmod, attr) for attr in REQUIRED) else None
+            record = { 'stamp': stamp, 'label': label }
+            obj = modapi.adapt(importedmod) if label is not None else None
+        files[entry.name] = record
+        if record['label'] is not None:
+            mods[record['label']] = ModEntry(name, obj)
+    if files != cached:
+        write(directory, files)
+    return mods
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+import copy
+
+# Modules written for API version 2 set API_VERSION = 2 and provide
+#
+#   get_config()                        the default config, a picklable dict
+#   validate_config(config)             True if update_filenames can use it
+#   update_filenames(files, config)     the new names, without side effects
+#   get_options() & show_ui(tkui)       as before, with the config the UI
+#                                       edits kept in module.config
+#
+# Modules that set POSITIONAL = True also take an offset, the index of
+# the first of the files in the whole list, as a third argument.
+# Modules that provide get_sort_key(config), returning one of the keys of
+# jabr.sortkeys.KEYS or None, take the rank of each of the files once
+# sorted by that key as a fourth argument when it does not return None.
+# Modules that provide get_filedata(files, config), files being the records
+# of Files.list, take the item of the list it returns for each of the files
+# as a fourth argument.
+API_VERSION = 2
+
+def get_api_version(mod):
+    return getattr(mod, 'API_VERSION', 1)
+
+class LegacyModule:
+    """ Adapts a module written before API version 2, whose config lives
+        in its module.config singleton, to API version 2
+
+        update_filenames runs on a fresh instance of the module's Module
+        class holding a copy of the config, or on the singleton if the
+        module has no Module class.
+    """
+    API_VERSION = API_VERSION
+
+    def __init__(self, mod):
+        self.mod = mod
+        self.LABEL = mod.LABEL
+        self.POSITIONAL = getattr(mod, 'POSITIONAL', None)
+        self.module = getattr(mod, 'module', None)
+
+    def get_options(self):
+        return self.mod.get_options()
+
+    def show_ui(self, tkui):
+        return self.mod.show_ui(tkui)
+
+    def get_config(self):
+        return copy.deepcopy(getattr(self.module, 'config', {}))
+
+    def _get_instance(self, config):
+        if not hasattr(self.mod, 'Module'):
+            return None
+        instance = self.mod.Module()
+        if hasattr(instance, 'config'):
+            instance.config.update(copy.deepcopy(config))
+        if hasattr(instance, 'validate_config'):
+            instance.has_validconfig = instance.validate_config()
+        return instance
+
+    def validate_config(self, config):
+        instance = self._get_instance(config)
+        return getattr(instance, 'has_validconfig', True)
+
+    def update_filenames(self, files, config, offset=0):
+        instance = self._get_instance(config)
+        update_filenames = instance.update_filenames if instance is not None else self.mod.update_filenames
+        if self.POSITIONAL:
+            return update_filenames(files, offset)
+        return update_filenames(files)
+
+def adapt(mod):
+    """ Returns the module if it is written for API version 2,
+        otherwise a LegacyModule wrapping it
+    """
+    if get_api_version(mod) >= API_VERSION:
+        return mod
+    return LegacyModule(mod)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+from jabr import digests
+
+LABEL = 'Content Hash'
+API_VERSION = 2
+POSITIONAL = False
+
+# Files hashed at once, reading more of them in parallel only makes a disk seek
+WORKERS = 4
+
+LIMITS = {
+    'length': { 'min': 4, 'max': 128 }
+}
+OPTIONS = {
+    'algorithm': {
+        'SHA-256': 'sha256',
+        'BLAKE2b': 'blake2b'
+    },
+    'length': 'Any integer from {0} to {1}'.format(
+        LIMITS['length']['min'],
+        LIMITS['length']['max']
+    ),
+    'format': {
+        'Hash': 0,
+        'OldName Text Hash': 1,
+        'Hash Text OldName': 2
+    },
+    'text': 'Text put between the old name and the hash'
+}
+
+cache = None
+
+def get_cache():
+    """ Returns the session's digest cache, created when first needed """
+    global cache
+    if cache is None:
+        cache = digests.DigestCache()
+    return cache
+
+def get_config():
+    return {
+        'algorithm': OPTIONS['algorithm']['SHA-256'],
+        'length': 16,
+        'format': OPTIONS['format']['Hash'],
+        'text': ''
+    }
+
+def validate_config(config):
+    length = config['length']
+    if not str(length).isdigit():
+        return False
+    length = int(length)
+    if length < LIMITS['length']['min'] or length > LIMITS['length']['max']:
+        return False
+    return config['algorithm'] in OPTIONS['algorithm'].values() and config['format'] in OPTIONS['format'].values()
+
+def get_filedata(files, config):
+    """ Returns the hex digest of each file's content, None for the files
+        that cannot be read
+    """
+    if not validate_config(config):
+        return [None] * len(files)
+    return get_cache().get([f['fullpath'] for f in files], config['algorithm'], WORKERS)
+
+def update_filenames(files, config, offset=0, hashes=None):
+    """ Names the files by the hashes get_filedata returned for them,
+        keeping the names of the files that have none
+    """
+    if hashes is None or not validate_config(config):
+        return files
+
+    length = int(config['length'])
+    format = config['format']
+    text = config['text']
+    newnames = []
+    for f, h in zip(files, hashes):
+        if h is None:
+            newnames.append(f)
+        elif format == OPTIONS['format']['OldName Text Hash']:
+            newnames.append(''.join([f, text, h[:length]]))
+        elif format == OPTIONS['format']['Hash Text OldName']:
+            newnames.append(''.join([h[:length], text, f]))
+        else:
+            newnames.append(h[:length])
+    return newnames
+
+class Module:
+    def __init__(self):
+        self.tkui = False
+        self.ui = {}
+        self.has_validconfig = True
+        self.limits = LIMITS
+        self.options = OPTIONS
+        self.config = get_config()
+
+    def show_ui(self, tkui):
+        self.tkui = tkui
+        algorithm_label = tkui.tkinter.Label(tkui.module_grp, text='Algorithm:')
+        algorithm_label.grid(column=0, row=0, sticky='e')
+        algorithm_options = self.options['algorithm']
+        algorithm_var = tkui.tkinter.StringVar()
+        algorithm_var.set([key for key, val in algorithm_options.items() if val == self.config['algorithm']][0])
+        algorithm_optionmenu = tkui.tkinter.OptionMenu(
+            tkui.module_grp,
+            algorithm_var,
+            *algorithm_options.keys(),
+            command=lambda algorithm: self.update_ui({ 'algorithm': algorithm_options[algorithm] })
+        )
+        algorithm_optionmenu.configure(width=20)
+        algorithm_optionmenu.grid(column=1, row=0, sticky='w')
+
+        length_label = tkui.tkinter.Label(tkui.module_grp, text='Length:')
+        length_label.grid(column=2, row=0, sticky='e')
+        length_var = tkui.tkinter.StringVar()
+        length_var.set(self.config['length'])
+        length_spinbox = tkui.tkinter.Spinbox(
+            tkui.module_grp,
+            from_=self.limits['length']['min'],
+            to=self.limits['length']['max'],
+            textvariable=length_var,
+            command=lambda: self.update_ui({ 'length': length_var.get() })
+        )
+        length_spinbox.grid(column=3, row=0, sticky='w')
+        length_spinbox.bind('<KeyRelease>', lambda _: self.update_ui({ 'length': length_var.get() }))
+        self.ui['length_spinbox'] = length_spinbox
+
+        format_label = tkui.tkinter.Label(tkui.module_grp, text='Format:')
+        format_label.grid(column=0, row=1, sticky='e')
+        format_options = self.options['format']
+        format_var = tkui.tkinter.StringVar()
+        format_var.set([key for key, val in format_options.items() if val == self.config['format']][0])
+        format_optionmenu = tkui.tkinter.OptionMenu(
+            tkui.module_grp,
+            format_var,
+            *format_options.keys(),
+            command=lambda format: self.update_ui({ 'format': format_options[format] })
+        )
+        format_optionmenu.configure(width=20)
+        format_optionmenu.grid(column=1, row=1, sticky='w')
+
+        text_label = tkui.tkinter.Label(tkui.module_grp, text='Text:')
+        text_label.grid(column=2, row=1, sticky='e')
+        text_entry = tkui.tkinter.Entry(tkui.module_grp, width=1)
+        text_entry.grid(column=3, row=1, sticky='ew')
+        text_entry.bind('<KeyRelease>', lambda _: self.update_ui({ 'text': text_entry.get() }))
+        text_entry.insert(0, self.config['text'])
+
+        tkui.module_grp.grid_columnconfigure(3, weight=1)
+        self.has_validconfig = self.validate_config()
+
+    def update_ui(self, setting):
+        self.config.update(setting)
+        self.has_validconfig = self.validate_config()
+        self.tkui.update_newnames()
+
+    def validate_config(self):
+        if self.tkui:
+            if self.ui['length_spinbox'].get().isdigit():
+                self.ui['length_spinbox'].config(bg='white')
+            else:
+                self.ui['length_spinbox'].config(bg='red')
+                return False
+
+        return validate_config(self.config)
+
+module = Module()
+
+def get_options():
+    return OPTIONS
+
+def show_ui(tkui):
+    module.show_ui(tkui)
@@ -1,28 +1,74 @@
 #!/usr/bin/env python
 
+from jabr import vectorized
+
 LABEL = 'Insert'
+API_VERSION = 2
+POSITIONAL = False
+
+LIMITS = {
+    'position': { 'min': 0, 'max': 9999 }
+}
+OPTIONS = {
+    'insert': 'The text to insert',
+    'position': 'Any integer from {0} to {1}'.format(
+        LIMITS['position']['min'],
+        LIMITS['position']['max'],
+    ),
+    'from': { 'From the Left': 0, 'From the Right': 1 }
+}
+
+def get_config():
+    return {
+        'insert': '',
+        'position': LIMITS['position']['min'],
+        'from': OPTIONS['from']['From the Left']
+    }
+
+def validate_config(config):
+    if not str(config['position']).isdigit():
+        return False
+    return True
+
+def update_filenames(files, config):
+    if not validate_config(config):
+        return files
+
+    newfilenames = []
+    insert = config['insert']
+    position = int(config['position'])
+    from_ = config['from']
+    if vectorized.is_available('insert', len(files)):
+        return vectorized.insert(files, insert, position, from_ != OPTIONS['from']['From the Left'])
+
+    for f in files:
+        if position > len(f):
+            newfilenames.append(f)
+            continue
+
+        if from_ == OPTIONS['from']['From the Left']:
+            filename = ''.join([
+                f[0:position],
+                insert,
+                f[position:len(f)]
+            ])
+        else:
+            filename = ''.join([
+                f[0:len(f)-position],
+                insert,
+                f[len(f)-position:len(f)]
+            ])
+        newfilenames.append(filename)
+    return newfilenames
 
 class Module:
     def __init__(self):
         self.tkui = False
         self.ui = {}
         self.has_validconfig = True
-        self.limits = {
-            'position': { 'min': 0, 'max': 9999 }
-        }
-        self.options = {
-            'insert': 'The text to insert',
-            'position': 'Any integer from {0} to {1}'.format(
-                self.limits['position']['min'],
-                self.limits['position']['max'],
-            ),
-            'from': { 'From the Left': 0, 'From the Right': 1 }
-        }
-        self.config = {
-            'insert': '',
-            'position': self.limits['position']['min'],
-            'from': self.options['from']['From the Left']
-        }
+        self.limits = LIMITS
+        self.options = OPTIONS
+        self.config = get_config()
 
     def show_ui(self, tkui):
         self.tkui = tkui
@@ -85,47 +131,12 @@ class Module:
     def validate_config(self):
         if self.tkui and not self.check_spinbox(self.ui['position_spinbox']):
             return False
-
-        if not str(self.config['position']).isdigit():
-            return False
-        return True
-
-    def update_filenames(self, files):
-        if not self.has_validconfig:
-            return files
-
-        newfilenames = []
-        insert = self.config['insert']
-        position = int(self.config['position'])
-        from_ = self.config['from']
-
-        for f in files:
-            if position > len(f):
-                newfilenames.append(f)
-                continue
-
-            if from_ == self.options['from']['From the Left']:
-                filename = ''.join([
-                    f[0:position],
-                    insert,
-                    f[position:len(f)]
-                ])
-            else:
-                filename = ''.join([
-                    f[0:len(f)-position],
-                    insert,
-                    f[len(f)-position:len(f)]
-                ])
-            newfilenames.append(filename)
-        return newfilenames
+        return validate_config(self.config)
 
 module = Module()
 
 def get_options():
-    return module.options
+    return OPTIONS
 
 def show_ui(tkui):
-    module.show_ui(tkui)
-
-def update_filenames(files):
-    return module.update_filenames(files)
+    module.show_ui(tkui)
\ No newline at end of file
@@ -1,12 +1,37 @@
 #!/usr/bin/env python
 
+from jabr import vectorized
+
 LABEL = 'Letter Case'
+API_VERSION = 2
+POSITIONAL = False
+
+OPTIONS = { 'case': { 'Capitalization': 0, 'lower case': 1, 'UPPER CASE': 2 } }
+
+def get_config():
+    return { 'case': OPTIONS['case']['Capitalization'] }
+
+def validate_config(config):
+    return config['case'] in OPTIONS['case'].values()
+
+def update_filenames(files, config):
+    case = config['case']
+    case_options = OPTIONS['case']
+    if vectorized.is_available('case', len(files)):
+        methods = { case_options['Capitalization']: 'title', case_options['lower case']: 'lower' }
+        return vectorized.change_case(files, methods.get(case, 'upper'))
+    if case == case_options['Capitalization']:
+        return [f.title() for f in files]
+    elif case == case_options['lower case']:
+        return [f.lower() for f in files]
+    else:
+        return [f.upper() for f in files]
 
 class Module:
     def __init__(self):
         self.tkui = False
-        self.options = { 'case': { 'Capitalization': 0, 'lower case': 1, 'UPPER CASE': 2 } }
-        self.config = { 'case': self.options['case']['Capitalization'] }
+        self.options = OPTIONS
+        self.config = get_config()
 
     def show_ui(self, tkui):
         self.tkui = tkui
@@ -28,23 +53,10 @@ class Module:
         self.config.update({ 'case': self.options['case'][case] })
         self.tkui.update_newnames()
 
-    def update_filenames(self, files):
-        case = self.config['case']
-        case_options = self.options['case']
-        if case == case_options['Capitalization']:
-            return [f.title() for f in files]
-        elif case == case_options['lower case']:
-            return [f.lower() for f in files]
-        else:
-            return [f.upper() for f in files]
-
 module = Module()
 
 def get_options():
-    return module.options
+    return OPTIONS
 
 def show_ui(tkui):
-    module.show_ui(tkui)
-
-def update_filenames(files):
-    return module.update_filenames(files)
\ No newline at end of file
+    module.show_ui(tkui)
\ No newline at end of file
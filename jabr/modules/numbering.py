@@ -1,37 +1,120 @@
 #!/usr/bin/env python
 
+from jabr import sortkeys
+from jabr import vectorized
+
 LABEL = 'Numbering'
+API_VERSION = 2
+POSITIONAL = True
+
+LIMITS = {
+    'leading zeros': { 'min': 0, 'max': 10 },
+    'start': { 'min': 1 }
+}
+OPTIONS = {
+    'leading zeros': 'Any integer from {0} to {1}'.format(
+        LIMITS['leading zeros']['min'],
+        LIMITS['leading zeros']['max']
+    ),
+    'start': 'A positive integer',
+    'format': {
+        'OldName Text Number': 0,
+        'Number Text OldName': 1,
+        'Text Number OldName': 2,
+        'Text Number': 3,
+        'Number Text': 4
+    },
+    'text': 'Text which serves as the label for the file',
+    'sort': {
+        'List Order': 0,
+        'Name': 1,
+        'Folder then Name': 2,
+        'Date Modified': 3,
+        # Where files have no creation time, sorting by it takes the last change
+        # of their metadata instead, so configs are the same on every platform
+        'Date Created' if sortkeys.HAS_BIRTHTIME else 'Date Changed': 4,
+        'Size': 5
+    }
+}
+# The jabr.sortkeys key each sort numbers the files by, None for their order in the list
+SORT_KEYS = {
+    0: None,
+    1: 'natural',
+    2: 'folder',
+    3: 'mtime',
+    4: 'birthtime',
+    5: 'size'
+}
+# The order of the parts of each format for the vectorized backend
+PARTS = {
+    OPTIONS['format']['OldName Text Number']: ('name', 'text', 'number'),
+    OPTIONS['format']['Number Text OldName']: ('number', 'text', 'name'),
+    OPTIONS['format']['Text Number OldName']: ('text', 'number', 'name'),
+    OPTIONS['format']['Text Number']: ('text', 'number'),
+    OPTIONS['format']['Number Text']: ('number', 'text')
+}
+
+def get_config():
+    return {
+        'leading zeros': LIMITS['leading zeros']['min'],
+        'start': 1,
+        'format': OPTIONS['format']['OldName Text Number'],
+        'text': '',
+        'sort': OPTIONS['sort']['List Order']
+    }
+
+def validate_config(config):
+    leading_zeros = config['leading zeros']
+    start = config['start']
+    if not str(start).isdigit() or not str(leading_zeros).isdigit():
+        return False
+
+    leading_zeros = int(leading_zeros)
+    start = int(start)
+    if leading_zeros < LIMITS['leading zeros']['min'] or leading_zeros > LIMITS['leading zeros']['max']:
+        return False
+    if start < LIMITS['start']['min']:
+        return False
+    return config.get('sort', OPTIONS['sort']['List Order']) in SORT_KEYS
+
+def get_sort_key(config):
+    return SORT_KEYS.get(config.get('sort'))
+
+def update_filenames(files, config, offset=0, ranks=None):
+    """ Numbers the files as if the first one was at index offset of the list,
+        or by their rank if they are sorted, see get_sort_key
+    """
+    if not validate_config(config):
+        return files
+
+    leading_zeros = int(config['leading zeros']) + 1
+    start = int(config['start'])
+    format = config['format']
+    text = config['text']
+    if ranks is None:
+        numbers = range(start + offset, start + offset + len(files))
+    else:
+        numbers = [start + r for r in ranks]
+    if vectorized.is_available('number', len(files)):
+        return vectorized.number(files, numbers, leading_zeros, text, PARTS.get(format, PARTS[OPTIONS['format']['Number Text']]))
+    if format == OPTIONS['format']['OldName Text Number']:
+        return [''.join([f, text, '%0{0}d'.format(leading_zeros) % n]) for f, n in zip(files, numbers)]
+    elif format == OPTIONS['format']['Number Text OldName']:
+        return [''.join(['%0{0}d'.format(leading_zeros) % n, text, f]) for f, n in zip(files, numbers)]
+    elif format == OPTIONS['format']['Text Number OldName']:
+        return [''.join([text, '%0{0}d'.format(leading_zeros) % n, f]) for f, n in zip(files, numbers)]
+    elif format == OPTIONS['format']['Text Number']:
+        return [''.join([text, '%0{0}d'.format(leading_zeros) % n]) for n in numbers]
+    return [''.join(['%0{0}d'.format(leading_zeros) % n, text]) for n in numbers]
 
 class Module:
     def __init__(self):
         self.tkui = False
         self.ui = {}
         self.has_validconfig = True
-        self.limits = {
-            'leading zeros': { 'min': 0, 'max': 10 },
-            'start': { 'min': 1 }
-        }
-        self.options = {
-            'leading zeros': 'Any integer from {0} to {1}'.format(
-                self.limits['leading zeros']['min'],
-                self.limits['leading zeros']['max']
-            ),
-            'start': 'A positive integer',
-            'format': {
-                'OldName Text Number': 0,
-                'Number Text OldName': 1,
-                'Text Number OldName': 2,
-                'Text Number': 3,
-                'Number Text': 4
-            },
-            'text': 'Text which serves as the label for the file'
-        }
-        self.config = {
-            'leading zeros': self.limits['leading zeros']['min'],
-            'start': 1,
-            'format': self.options['format']['OldName Text Number'],
-            'text': ''
-        }
+        self.limits = LIMITS
+        self.options = OPTIONS
+        self.config = get_config()
 
     def show_ui(self, tkui):
         module.tkui = tkui
@@ -79,6 +162,20 @@ class Module:
         text_entry.bind('<KeyRelease>', lambda _: self.update_ui({ 'text': text_entry.get() }))
         text_entry.insert(0, self.config['text'])
 
+        sort_label = tkui.tkinter.Label(tkui.module_grp, text='Sort by:')
+        sort_label.grid(column=0, row=2, sticky='e')
+        sort_options = self.options['sort']
+        sort_var = tkui.tkinter.StringVar()
+        sort_var.set([key for key, val in sort_options.items() if val == self.config['sort']][0])
+        sort_optionmenu = tkui.tkinter.OptionMenu(
+            tkui.module_grp,
+            sort_var,
+            *sort_options.keys(),
+            command=lambda sort: self.update_ui({ 'sort': sort_options[sort] })
+        )
+        sort_optionmenu.configure(width=20)
+        sort_optionmenu.grid(column=1, row=2, sticky='w')
+
         tkui.module_grp.grid_columnconfigure(3, weight=1)
         self.check_ui()
 
@@ -107,44 +204,12 @@ class Module:
             if not is_leading_zeros_valid or not is_start_valid:
                 return False
 
-        leading_zeros = self.config['leading zeros']
-        start = self.config['start']
-        if not str(start).isdigit() or not str(leading_zeros).isdigit():
-            return False
-
-        leading_zeros = int(leading_zeros)
-        start = int(start)
-        if leading_zeros < self.limits['leading zeros']['min'] or leading_zeros > self.limits['leading zeros']['max']:
-            return False
-        if start < self.limits['start']['min']:
-            return False
-        return True
-
-    def update_filenames(self, files):
-        if not self.has_validconfig:
-            return files
-
-        leading_zeros = int(self.config['leading zeros']) + 1
-        start = int(self.config['start'])
-        format = self.config['format']
-        text = self.config['text']
-        if format == self.options['format']['OldName Text Number']:
-            return [''.join([f, text, '%0{0}d'.format(leading_zeros) % (start + i)]) for i, f in enumerate(files)]
-        elif format == self.options['format']['Number Text OldName']:
-            return [''.join(['%0{0}d'.format(leading_zeros) % (start + i), text, f]) for i, f in enumerate(files)]
-        elif format == self.options['format']['Text Number OldName']:
-            return [''.join([text, '%0{0}d'.format(leading_zeros) % (start + i), f]) for i, f in enumerate(files)]
-        elif format == self.options['format']['Text Number']:
-            return [''.join([text, '%0{0}d'.format(leading_zeros) % (start + i)]) for i, f in enumerate(files)]
-        return [''.join(['%0{0}d'.format(leading_zeros) % (start + i), text]) for i, f in enumerate(files)]
+        return validate_config(self.config)
 
 module = Module()
 
 def get_options():
-    return module.options
+    return OPTIONS
 
 def show_ui(tkui):
-    module.show_ui(tkui)
-
-def update_filenames(files):
-    return module.update_filenames(files)
\ No newline at end of file
+    module.show_ui(tkui)
\ No newline at end of file
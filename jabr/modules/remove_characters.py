@@ -1,32 +1,77 @@
 #!/usr/bin/env python
 
+from jabr import vectorized
+
 LABEL = 'Remove Characters'
+API_VERSION = 2
+POSITIONAL = False
+
+LIMITS = {
+    'start': { 'min': 0, 'max': 9999 },
+    'end': { 'min': 0, 'max': 9999 }
+}
+OPTIONS = {
+    'start': 'Any integer from {0} to {1}'.format(
+        LIMITS['start']['min'],
+        LIMITS['start']['max']
+    ),
+    'end': 'Any integer from {0} to {1}'.format(
+        LIMITS['end']['min'],
+        LIMITS['end']['max']
+    ),
+    'from': { 'From the Left': 0, 'From the Right': 1 }
+}
+
+def get_config():
+    return {
+        'start': LIMITS['start']['min'],
+        'end': LIMITS['end']['min'],
+        'from': OPTIONS['from']['From the Left']
+    }
+
+def validate_config(config):
+    start = config['start']
+    end = config['end']
+    if not str(start).isdigit() or not str(end).isdigit():
+        return False
+
+    start = int(start)
+    end = int(end)
+    if start < LIMITS['start']['min'] or start > LIMITS['start']['max']:
+        return False
+    if end < LIMITS['end']['min'] or end > LIMITS['end']['max']:
+        return False
+    if start >= end:
+        return False
+    return True
+
+def update_filenames(files, config):
+    if not validate_config(config):
+        return files
+
+    newfilenames = []
+    start = int(config['start'])
+    end = int(config['end'])
+    from_ = config['from']
+    if vectorized.is_available('remove', len(files)):
+        return vectorized.remove(files, start, end, from_ != OPTIONS['from']['From the Left'])
+    if from_ == OPTIONS['from']['From the Left']:
+        return [f[:start] + f[end:] for f in files]
+
+    for f in files:
+        # Each file gets its own start so that rows do not depend on each other
+        filestart = -(len(f)) if (start == 0) else start
+        newfilenames.append(f[:-(end)] + f[-(filestart):])
+    return newfilenames
 
 class Module:
     def __init__(self):
         self.tkui = False
         self.ui = {}
         self.has_validconfig = True
-        self.limits = {
-            'start': { 'min': 0, 'max': 9999 },
-            'end': { 'min': 0, 'max': 9999 }
-        }
-        self.options = {
-            'start': 'Any integer from {0} to {1}'.format(
-                self.limits['start']['min'],
-                self.limits['start']['max']
-            ),
-            'end': 'Any integer from {0} to {1}'.format(
-                self.limits['end']['min'],
-                self.limits['end']['max']
-            ),
-            'from': { 'From the Left': 0, 'From the Right': 1 }
-        }
-        self.config = {
-            'start': self.limits['start']['min'],
-            'end': self.limits['end']['min'],
-            'from': self.options['from']['From the Left']
-        }
+        self.limits = LIMITS
+        self.options = OPTIONS
+        self.config = get_config()
 
     def show_ui(self, tkui):
         module.tkui = tkui
@@ -102,44 +147,12 @@ class Module:
             if not is_startvalid or not is_endvalid:
                 return False
 
-        start = self.config['start']
-        end = self.config['end']
-        if not str(start).isdigit() or not str(end).isdigit():
-            return False
-
-        start = int(start)
-        end = int(end)
-        if start < self.limits['start']['min'] or start > self.limits['start']['max']:
-            return False
-        if end < self.limits['end']['min'] or end > self.limits['end']['max']:
-            return False
-        if start >= end:
-            return False
-        return True
-
-    def update_filenames(self, files):
-        if not self.has_validconfig:
-            return files
-
-        newfilenames = []
-        start = int(self.config['start'])
-        end = int(self.config['end'])
-        from_ = self.config['from']
-        if from_ == self.options['from']['From the Left']:
-            return [f[:start] + f[end:] for f in files]
-
-        for f in files:
-            start = -(len(f)) if (start == 0) else start
-            newfilenames.append(f[:-(end)] + f[-(start):])
-        return newfilenames
+        return validate_config(self.config)
 
 module = Module()
 
 def get_options():
-    return module.options
+    return OPTIONS
 
 def show_ui(tkui):
-    module.show_ui(tkui)
-
-def update_filenames(files):
-    return module.update_filenames(files)
\ No newline at end of file
+    module.show_ui(tkui)
\ No newline at end of file
@@ -1,23 +1,219 @@
 #!/usr/bin/env python
 
 LABEL = 'Replace'
+API_VERSION = 2
+POSITIONAL = False
 
+import functools
 import re
 
+from jabr import regexguard
+
+try:
+    import re._parser as sre_parse # Python 3.11 or greater
+except ImportError:
+    import sre_parse
+
+OPTIONS = {
+    'find': 'The text or pattern to find',
+    'replacer': 'The text to replace it with',
+    'regex': { 'False': 0, 'True':1 }
+}
+
+NEWLINE = ord('\n')
+
+class ConfigError(ValueError):
+    """ Raised for a find pattern or replacer template that is not valid """
+    def __init__(self, setting, error):
+        ValueError.__init__(self, '{0}: {1}'.format(setting, error))
+        self.setting = setting
+
+def get_config():
+    return {
+        'find': '',
+        'replacer': '',
+        'regex': OPTIONS['regex']['False']
+    }
+
+def _can_match_newline(items, flags):
+    """ Returns True unless the parsed pattern is known to neither match
+        a newline nor look past one, so that matching it over names joined
+        by newlines gives the same result as matching each name
+    """
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            if av == NEWLINE:
+                return True
+        elif op is sre_parse.ANY:
+            if flags & re.DOTALL:
+                return True
+        elif op is sre_parse.RANGE:
+            if av[0] <= NEWLINE <= av[1]:
+                return True
+        elif op is sre_parse.CATEGORY:
+            if av not in (sre_parse.CATEGORY_DIGIT, sre_parse.CATEGORY_WORD, sre_parse.CATEGORY_NOT_SPACE):
+                return True
+        elif op is sre_parse.AT:
+            # \B never matches an empty name but does between two newlines
+            if av is not sre_parse.AT_BOUNDARY:
+                return True
+        elif op is sre_parse.IN:
+            if _can_match_newline(av, flags):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            if _can_match_newline(av[-1], flags | av[1]):
+                return True
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            if _can_match_newline(av[-1], flags):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(_can_match_newline(b, flags) for b in av[1]):
+                return True
+        elif op is not sre_parse.GROUPREF:
+            # Lookarounds, negated sets & anything newer
+            return True
+    return False
+
+def _count_repeats(items, inrepeat=False):
+    """ Returns the number of unbounded repeats in the parsed pattern, or
+        None if a repeat holds another repeat or alternatives, or if there
+        is anything else that can take exponential time to fail
+    """
+    count = 0
+    for op, av in items:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            if inrepeat and av[1] > 1:
+                return None
+            inner = _count_repeats(av[-1], inrepeat or av[1] > 1)
+            if inner is None:
+                return None
+            count += inner + (av[1] == sre_parse.MAXREPEAT)
+        elif op is sre_parse.SUBPATTERN:
+            inner = _count_repeats(av[-1], inrepeat)
+            if inner is None:
+                return None
+            count += inner
+        elif op is sre_parse.BRANCH:
+            if inrepeat:
+                return None
+            for branch in av[1]:
+                inner = _count_repeats(branch, inrepeat)
+                if inner is None:
+                    return None
+                count += inner
+        elif op not in (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN, sre_parse.AT, sre_parse.CATEGORY):
+            # Back references, lookarounds & anything newer
+            return None
+    return count
+
+@functools.lru_cache(maxsize=32)
+def compile_config(find, replacer):
+    """ Compiles find & checks that replacer is a valid template for it,
+        then returns the pattern, whether names can be run through it
+        joined by newlines and whether it may backtrack catastrophically,
+        raises ConfigError otherwise
+    """
+    try:
+        pattern = re.compile(find)
+    except re.error as e:
+        raise ConfigError('find', e)
+
+    # An empty match of a pattern with the same groups expands the
+    # template exactly like sub would, without having to match anything
+    groupnames = { i: n for n, i in pattern.groupindex.items() }
+    groups = ''.join(
+        '(?P<{0}>)'.format(groupnames[i]) if i in groupnames else '()'
+        for i in range(1, pattern.groups + 1)
+    )
+    try:
+        literal = re.fullmatch(groups, '').expand(replacer)
+    except (re.error, IndexError) as e:
+        raise ConfigError('replacer', e)
+
+    parsed = sre_parse.parse(find)
+    batchable = '\n' not in literal and not _can_match_newline(parsed, pattern.flags)
+    repeats = _count_repeats(parsed)
+    return pattern, batchable, repeats is None or repeats >= 3
+
+_guard = None
+
+def get_guard():
+    """ Returns the GuardedRegex that runs risky patterns in this process """
+    global _guard
+    if _guard is None:
+        _guard = regexguard.GuardedRegex()
+    return _guard
+
+def get_errors(config):
+    """ Returns the settings of the config that are not valid """
+    if not config['regex'] or not config['find']:
+        return set()
+    try:
+        compile_config(config['find'], config['replacer'])
+    except ConfigError as e:
+        return { e.setting }
+    if _guard is not None and config['find'] in _guard.flagged:
+        return { 'find' }
+    return set()
+
+def validate_config(config):
+    return not get_errors(config)
+
+def _sub_joined(subs, files, chunksize=10000):
+    """ Runs subs over the files joined by newlines, chunksize names per
+        string, or returns None if a name holds a newline itself
+    """
+    joined = ['\n'.join(files[i:i+chunksize]) for i in range(0, len(files), chunksize)]
+    if sum(j.count('\n') for j in joined) != len(files) - len(joined):
+        return None
+    newfilenames = []
+    for j in subs(joined):
+        newfilenames.extend(j.split('\n'))
+    return newfilenames if len(newfilenames) == len(files) else None
+
+def _get_regex_subs(find, replacer, pattern, risky):
+    if not risky:
+        return lambda strings: [pattern.sub(replacer, s) for s in strings]
+    linear = regexguard.compile_linear(find)
+    if linear is not None:
+        return lambda strings: [linear.sub(replacer, s) for s in strings]
+    # Risky patterns run in a worker process that is killed if they hang
+    guard = get_guard()
+    return lambda strings: guard.sub(find, replacer, strings)
+
+def update_filenames(files, config):
+    find = config['find']
+    replacer = config['replacer']
+    is_regex = config['regex']
+    if not find or not files:
+        return files
+
+    if is_regex:
+        try:
+            pattern, batchable, risky = compile_config(find, replacer)
+        except ConfigError:
+            return files
+        subs = _get_regex_subs(find, replacer, pattern, risky)
+    else:
+        batchable = '\n' not in find and '\n' not in replacer
+        subs = lambda strings: [s.replace(find, replacer) for s in strings]
+
+    try:
+        if batchable:
+            newfilenames = _sub_joined(subs, files)
+            if newfilenames is not None:
+                return newfilenames
+        return subs(files)
+    except regexguard.PatternTimeout:
+        # The pattern is flagged, not each file
+        return files
+
 class Module:
     def __init__(self):
         self.tkui = False
         self.ui = {}
-        self.options = {
-            'find': 'The text or pattern to find',
-            'replacer': 'The text to replace it with',
-            'regex': { 'False': 0, 'True':1 }
-        }
-        self.config = {
-            'find': '',
-            'replacer': '',
-            'regex': self.options['regex']['False']
-        }
+        self.options = OPTIONS
+        self.config = get_config()
 
     def show_ui(self, tkui):
         self.tkui = tkui
@@ -48,35 +244,22 @@ class Module:
         self.ui['replacer_entry'] = replacer_entry
 
         tkui.module_grp.grid_columnconfigure(1, weight=1)
+        self.check_ui()
+
+    def check_ui(self):
+        errors = get_errors(self.config)
+        for setting in ('find', 'replacer'):
+            self.ui['{0}_entry'.format(setting)].config(bg='red' if setting in errors else 'white')
 
     def update_ui(self, setting):
         self.config.update(setting)
+        self.check_ui()
         self.tkui.update_newnames()
 
-    def update_filenames(self, files):
-        find = self.config['find']
-        replacer = self.config['replacer']
-        is_regex = self.config['regex']
-        if not find:
-            return files
-
-        if is_regex:
-            newfilenames = []
-            for f in files:
-                try:
-                    newfilenames.append(re.sub(find, replacer, f))
-                except re.error:
-                    newfilenames.append(f)
-            return newfilenames
-        return [f.replace(find, replacer) for f in files]
-
 module = Module()
 
 def get_options():
-    return module.options
+    return OPTIONS
 
 def show_ui(tkui):
-    module.show_ui(tkui)
-
-def update_filenames(files):
-    return module.update_filenames(files)
\ No newline at end of file
+    module.show_ui(tkui)
\ No newline at end of file
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+import importlib
+import os
+import sys
+import time
+
+from jabr import modapi
+from jabr.pipeline import Pipeline, Stage
+
+def is_free_threaded():
+    """ Returns True on builds of Python running without the GIL """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+def get_spec(mod):
+    """ Returns (module name, directory, config) for each stage of a Stage
+        or Pipeline so that a worker process can import the modules itself,
+        or None if one of them was not loaded from a file
+    """
+    spec = []
+    for stage in getattr(mod, 'stages', [mod]):
+        if not isinstance(stage, Stage):
+            return None
+        source = getattr(stage.mod, 'mod', stage.mod)
+        path = getattr(source, '__file__', None)
+        if path is None:
+            return None
+        spec.append((source.__name__, os.path.dirname(os.path.abspath(path)), stage.config))
+    return tuple(spec)
+
+def get_filedata(mod, offset, count):
+    """ Returns the file data each stage of a Stage or Pipeline has for
+        count names from index offset, see Stage.prepare
+    """
+    return tuple(s.get_filedata(offset, count) for s in getattr(mod, 'stages', [mod]))
+
+def _run_chunk(spec, names, offset, filedata):
+    """ Runs in a worker process, returns the new names along with
+        the seconds spent in each stage
+    """
+    stages = []
+    for (modname, dirpath, config), stagedata in zip(spec, filedata):
+        if dirpath not in sys.path:
+            sys.path.append(dirpath)
+        stage = Stage(modapi.adapt(importlib.import_module(modname)), config)
+        stage.filedata = stagedata
+        stage.filedata_offset = offset
+        stages.append(stage)
+    pipeline = Pipeline(stages)
+    return pipeline.update_filenames(names, offset), pipeline.timings
+
+class ParallelTransformer:
+    """ Runs a Stage or Pipeline over a list of names split in chunks on
+        a pool of worker processes, or of threads on free-threaded builds,
+        then stitches the results back together in order
+
+        Lists are transformed serially if they have fewer than min_items
+        names, if timing the first sample names says the rest would take
+        less than min_seconds serially, or if the module needs every name
+        at once or cannot be imported by a worker process. last_mode says
+        which way the last list went. The timings of the stages run by
+        worker processes are added to those of a Pipeline.
+    """
+    def __init__(self, workers=None, chunksize=None, min_items=20000, min_seconds=0.5, sample=2000):
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.chunksize = chunksize
+        self.min_items = min_items
+        self.min_seconds = min_seconds
+        self.sample = sample
+        self.threads = is_free_threaded()
+        self.last_mode = None
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _get_pool(self):
+        # Imported with the first pool, most lists never need one
+        import concurrent.futures
+        import multiprocessing
+        if self._pool is None:
+            if self.threads:
+                self._pool = concurrent.futures.ThreadPoolExecutor(self.workers)
+            else:
+                # Forking a process that runs Tk & preview threads is unsafe
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._pool = concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=context)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _get_chunksize(self, count):
+        if self.chunksize:
+            return self.chunksize
+        # A few chunks per worker evens out chunks that take longer
+        return max(1, -(-count // (self.workers * 4)))
+
+    def update_filenames(self, mod, names, offset=0):
+        """ Returns the new names mod gives the names, offset being
+            the index of the first name in the whole list
+        """
+        names = list(names)
+        serial = self.workers < 2 or len(names) < self.min_items or mod.POSITIONAL is None
+        spec = None
+        if not serial and not self.threads:
+            spec = get_spec(mod)
+            serial = spec is None
+        if serial:
+            self.last_mode = 'serial'
+            return list(mod.update_filenames(names, offset))
+
+        started = time.perf_counter()
+        newnames = list(mod.update_filenames(names[:self.sample], offset))
+        elapsed = time.perf_counter() - started
+        rest = len(names) - len(newnames)
+        if elapsed * rest / max(1, len(newnames)) < self.min_seconds:
+            self.last_mode = 'serial'
+            newnames.extend(mod.update_filenames(names[len(newnames):], offset + len(newnames)))
+            return newnames
+
+        self.last_mode = 'parallel'
+        pool = self._get_pool()
+        size = self._get_chunksize(rest)
+        futures = []
+        for start in range(len(newnames), len(names), size):
+            chunk = names[start:start+size]
+            if self.threads:
+                futures.append(pool.submit(mod.update_filenames, chunk, offset + start))
+            else:
+                futures.append(pool.submit(_run_chunk, spec, chunk, offset + start, get_filedata(mod, offset + start, len(chunk))))
+        for future in futures:
+            result = future.result()
+            if not self.threads:
+                result, timings = result
+                if isinstance(mod, Pipeline):
+                    mod.add_timings(timings)
+            newnames.extend(result)
+        return newnames
+
+    def bind(self, mod):
+        """ Returns an update_filenames(names, offset=0) function
+            for compute_newnames & iter_newnames
+        """
+        return lambda names, offset=0: self.update_filenames(mod, names, offset)
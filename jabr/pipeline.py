@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+import copy
+import itertools
+import time
+
+class Stage:
+    """ A module bound to a copy of a config, any setting it leaves out
+        being taken from the module's default config
+
+        Modules are expected to follow API version 2, see jabr.modapi.
+        filedata holds what prepare() got the module for each file, such
+        as its rank, filedata_offset being the index of the file the first
+        one belongs to.
+    """
+    def __init__(self, mod, config=None):
+        self.mod = mod
+        self.LABEL = mod.LABEL
+        self.POSITIONAL = getattr(mod, 'POSITIONAL', None)
+        self.config = mod.get_config()
+        if config is not None:
+            self.config.update(copy.deepcopy(config))
+        self.filedata = None
+        self.filedata_offset = 0
+
+    @property
+    def has_filedata(self):
+        return self.filedata is not None
+
+    def get_sort_key(self):
+        get_sort_key = getattr(self.mod, 'get_sort_key', None)
+        return get_sort_key(self.config) if get_sort_key is not None else None
+
+    def prepare(self, files, sortkeys, version=None):
+        """ Gets the module the data it asks for about each of the files,
+            the records of Files.list, if any: their ranks by its sort key
+            from a jabr.sortkeys.SortKeys, or what its get_filedata returns
+        """
+        self.filedata = None
+        self.filedata_offset = 0
+        key = self.get_sort_key()
+        if key is not None:
+            self.filedata = sortkeys.get_ranks(files, key, version)
+        elif hasattr(self.mod, 'get_filedata'):
+            self.filedata = self.mod.get_filedata(files, self.config)
+
+    def get_filedata(self, offset, count):
+        """ Returns the data of count files from index offset, or None """
+        if self.filedata is None:
+            return None
+        start = offset - self.filedata_offset
+        return self.filedata[start:start+count]
+
+    def update_filenames(self, files, offset=0):
+        if self.filedata is not None:
+            return self.mod.update_filenames(files, self.config, offset, self.get_filedata(offset, len(files)))
+        if self.POSITIONAL:
+            return self.mod.update_filenames(files, self.config, offset)
+        return self.mod.update_filenames(files, self.config)
+
+class Pipeline:
+    """ Runs names through a stack of stages in one pass
+
+        Names are read in chunks of chunksize and each chunk goes through
+        every stage before the next one is read, so no stage is handed a
+        full list of intermediate names. Stages of modules that do not set
+        POSITIONAL need every name at once and get a single chunk.
+        timings holds the seconds spent in each stage.
+    """
+    LABEL = 'Pipeline'
+
+    def __init__(self, stages=(), chunksize=4096):
+        self.stages = list(stages)
+        self.chunksize = chunksize
+        self.timings = [0.0] * len(self.stages)
+
+    def __len__(self):
+        return len(self.stages)
+
+    @property
+    def POSITIONAL(self):
+        positional = [s.POSITIONAL for s in self.stages]
+        if None in positional:
+            return None
+        return any(positional)
+
+    @property
+    def has_filedata(self):
+        return any(s.has_filedata for s in self.stages)
+
+    def prepare(self, files, sortkeys, version=None):
+        """ Gets each stage the data it asks for, see Stage.prepare """
+        for stage in self.stages:
+            stage.prepare(files, sortkeys, version)
+
+    def add(self, mod, config=None):
+        """ Adds a stage at the end, see Stage for config """
+        stage = Stage(mod, config)
+        self.stages.append(stage)
+        self.timings.append(0.0)
+        return stage
+
+    def clear(self):
+        del self.stages[:]
+        del self.timings[:]
+
+    def get_timings(self):
+        """ Returns (label, seconds) for every stage in order """
+        return [(s.LABEL, t) for s, t in zip(self.stages, self.timings)]
+
+    def add_timings(self, timings):
+        """ Adds the seconds another run of the same stages spent in each """
+        for i, t in enumerate(timings):
+            self.timings[i] += t
+
+    def run(self, names, offset=0):
+        """ Yields the new name of each of the names, offset being
+            the index of the first name in the whole list
+        """
+        names = iter(names)
+        chunksize = self.chunksize if self.POSITIONAL is not None else None
+        while True:
+            chunk = list(itertools.islice(names, chunksize))
+            if not chunk:
+                return
+            for i, stage in enumerate(self.stages):
+                started = time.perf_counter()
+                chunk = stage.update_filenames(chunk, offset)
+                self.timings[i] += time.perf_counter() - started
+            offset += len(chunk)
+            for n in chunk:
+                yield n
+
+    def update_filenames(self, files, offset=0):
+        return list(self.run(files, offset))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+import os
+
+class Plan:
+    """ An ordered rename plan
+
+        chains:     lists of (row, src, dst) steps; a step may only run
+                    after the previous step of its chain succeeded
+        temps:      temporary paths used to break cycles,
+                    mapped to the original path of the file parked there
+        duplicates: target paths claimed by more than one row
+    """
+    def __init__(self):
+        self.chains = []
+        self.temps = {}
+        self.duplicates = set()
+
+    def __len__(self):
+        return sum(len(c) for c in self.chains)
+
+    def steps(self):
+        for chain in self.chains:
+            for step in chain:
+                yield step
+
+def get_tempname(path, reserved, exists=os.path.lexists):
+    """ Returns an unused path next to the given path """
+    dirpath = os.path.dirname(path)
+    n = 0
+    while True:
+        tempname = os.path.join(dirpath, '.jabr-{0}-{1}.tmp'.format(os.getpid(), n))
+        if tempname not in reserved and not exists(tempname):
+            return tempname
+        n += 1
+
+def plan(sources, targets, exists=os.path.lexists):
+    """ Builds a rename plan from the current paths and their new paths,
+        a target of None or equal to its source means the row is left as is
+
+        A row whose target is the current path of another row depends on
+        that row being renamed first. Since every path has one owner the
+        dependencies form simple chains and cycles: chains are ordered
+        from their free end and each cycle is broken by parking one file
+        under a temporary name, so a batch of n files takes n renames
+        plus one per cycle.
+    """
+    result = Plan()
+    moving = {}
+    claimed = {}
+    for row, (src, dst) in enumerate(zip(sources, targets)):
+        if dst is None or dst == src:
+            continue
+        if dst in claimed:
+            result.duplicates.add(dst)
+            continue
+        claimed[dst] = row
+        moving[src] = row
+    if result.duplicates:
+        return result
+
+    # waiter[j] is the row that is renamed into the current path of row j
+    waiter = {}
+    for dst, row in claimed.items():
+        blocker = moving.get(dst)
+        if blocker is not None:
+            waiter[blocker] = row
+
+    done = set()
+    for dst, row in claimed.items():
+        if dst in moving:
+            continue
+        chain = []
+        while row is not None:
+            chain.append((row, sources[row], targets[row]))
+            done.add(row)
+            row = waiter.get(row)
+        result.chains.append(chain)
+
+    reserved = set(moving).union(claimed)
+    for row in sorted(claimed.values()):
+        if row in done:
+            continue
+        tempname = get_tempname(sources[row], reserved, exists)
+        reserved.add(tempname)
+        result.temps[tempname] = sources[row]
+        chain = [(row, sources[row], tempname)]
+        done.add(row)
+        current = waiter[row]
+        while current != row:
+            chain.append((current, sources[current], targets[current]))
+            done.add(current)
+            current = waiter[current]
+        chain.append((row, tempname, targets[row]))
+        result.chains.append(chain)
+    return result
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+
+import collections
+import sys
+import threading
+
+if sys.version_info[0] >= 3:
+    import queue
+else:
+    import Queue as queue
+
+class DuplicateIndex:
+    """ Keeps a multimap of new name -> rows so that duplicate new names
+        can be tracked by updating only the rows whose name changed
+    """
+    def __init__(self, size=0):
+        self.reset(size)
+
+    def reset(self, size=0):
+        """ Starts over with size rows, all of them blank """
+        self.names = [''] * size
+        self.rows = {}
+        self.duplicates = 0
+        self.blanks = size
+
+    def __len__(self):
+        return len(self.names)
+
+    def is_duplicate(self, row):
+        name = self.names[row]
+        return bool(name) and len(self.rows[name]) > 1
+
+    def is_valid(self):
+        """ Returns True if there is a new name to rename to and no duplicates """
+        return not self.duplicates and self.blanks < len(self.names)
+
+    def _discard(self, row, name, changed):
+        if not name:
+            self.blanks -= 1
+            return
+        rows = self.rows[name]
+        rows.discard(row)
+        if len(rows) == 1:
+            # The remaining row is no longer a duplicate
+            self.duplicates -= 2
+            changed.update(rows)
+        elif len(rows) > 1:
+            self.duplicates -= 1
+        else:
+            del self.rows[name]
+
+    def _add(self, row, name, changed):
+        if not name:
+            self.blanks += 1
+            return
+        rows = self.rows.setdefault(name, set())
+        rows.add(row)
+        if len(rows) == 2:
+            # The row that had the name first is now a duplicate too
+            self.duplicates += 2
+            changed.update(rows)
+        elif len(rows) > 2:
+            self.duplicates += 1
+
+    def update(self, changes):
+        """ Sets the names of the given (row, name) pairs then returns
+            the other rows whose duplicate state changed as a result
+        """
+        changed = set()
+        rows = set()
+        for row, name in changes:
+            oldname = self.names[row]
+            if oldname == name:
+                continue
+            rows.add(row)
+            self._discard(row, oldname, changed)
+            self.names[row] = name
+            self._add(row, name, changed)
+        return changed.difference(rows)
+
+    def splice(self, start, names):
+        """ Replaces the names from row start onwards with the given names,
+            which may change the number of rows, then returns the rows
+            before start whose duplicate state changed as a result
+        """
+        changed = set()
+        for row in range(start, len(self.names)):
+            self._discard(row, self.names[row], changed)
+        del self.names[start:]
+        for row, name in enumerate(names, start):
+            self.names.append(name)
+            self._add(row, name, changed)
+        return {row for row in changed if row < start}
+
+def freeze(value):
+    """ Returns a hashable copy of a config made of dicts, lists, sets & scalars """
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(v) for v in value)
+    hash(value)
+    return value
+
+def get_size(names):
+    """ Estimates the memory held by a sequence of names from a sample of them """
+    size = sys.getsizeof(names)
+    if names:
+        step = max(1, len(names) // 100)
+        sample = names[::step]
+        size += len(names) * sum(sys.getsizeof(n) for n in sample) // len(sample)
+    return size
+
+class PreviewCache:
+    """ A least recently used cache of computed previews
+
+        Entries are evicted once their estimated size adds up to more
+        than maxsize bytes. hits and misses count the lookups.
+    """
+    def __init__(self, maxsize=64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_state(self, mod):
+        if hasattr(mod, 'stages'):
+            return tuple(self._get_state(s) for s in mod.stages)
+        return (mod.LABEL, freeze(getattr(mod, 'config', None)))
+
+    def get_key(self, mod, filepart, version):
+        """ Returns the key of a preview made by a stage or the stages of
+            a pipeline with their config, or None if a config cannot be
+            frozen into a key or a stage reads the files, as their content
+            can change while the list stays the same
+        """
+        if any(hasattr(getattr(s, 'mod', s), 'get_filedata') for s in getattr(mod, 'stages', [mod])):
+            return None
+        try:
+            state = self._get_state(mod)
+        except TypeError:
+            return None
+        return (state, filepart, version)
+
+    def get(self, key):
+        entry = self._entries.get(key) if key is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, newnames):
+        if key is None:
+            return
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+        newnames = tuple(newnames)
+        size = get_size(newnames)
+        if size > self.maxsize:
+            return
+        self._entries[key] = (newnames, size)
+        self.size += size
+        while self.size > self.maxsize:
+            self.size -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+def compute_newnames(files, update_filenames, filepart):
+    """ Sends the given part of each file's name through update_filenames,
+        puts the results back together with the rest of each name
+        then blanks the names that did not change
+    """
+    newnames = list(update_filenames([f[filepart] for f in files]))
+    for i, f in enumerate(files):
+        if filepart == 'base':
+            if f['ext']:
+                newnames[i] = '.'.join([newnames[i], f['ext']])
+        elif filepart == 'ext':
+            if newnames[i]:
+                newnames[i] = '.'.join([f['base'], newnames[i]])
+        if f['fullname'] == newnames[i]:
+            newnames[i] = ''
+    return newnames
+
+def iter_newnames(files, update_filenames, filepart, positional, chunksize=100000):
+    """ Yields what compute_newnames returns for the files a chunk at a time,
+        update_filenames taking the names & the index of the first one
+
+        Modules with POSITIONAL set to None get every file in one chunk.
+    """
+    if positional is None:
+        chunksize = max(1, len(files))
+    for start in range(0, len(files), chunksize):
+        chunk = files[start:start+chunksize]
+        for n in compute_newnames(chunk, lambda names: update_filenames(names, start), filepart):
+            yield n
+
+def update_newnames(files, mod, filepart, newnames, changes):
+    """ Brings newnames, the new names of files before the given changes
+        from Files.get_changes were made, up to date by recomputing only
+        the rows the changes left dirty
+
+        Modules with POSITIONAL set to False only get the rows that were
+        added, modules with POSITIONAL set to True get every row from the
+        first one that changed onwards along with its index as offset.
+        Returns (newnames, start) where start is the first row that may
+        differ, or None if the module does not set POSITIONAL or has data
+        about the files, such as their ranks, which any change can move.
+    """
+    positional = getattr(mod, 'POSITIONAL', None)
+    if positional is None or getattr(mod, 'has_filedata', False):
+        return None
+    newnames = list(newnames)
+    start = len(newnames)
+    for kind, rows in changes:
+        if not rows:
+            continue
+        start = min(start, rows[0])
+        if kind == 'add':
+            newnames.extend([None] * len(rows))
+        else:
+            removed = set(rows)
+            newnames = [n for i, n in enumerate(newnames) if i not in removed]
+    if len(newnames) != len(files):
+        return None
+
+    if positional:
+        if start < len(files):
+            update_filenames = lambda names: mod.update_filenames(names, offset=start)
+            newnames[start:] = compute_newnames(files[start:], update_filenames, filepart)
+        return newnames, start
+
+    rows = [i for i in range(start, len(newnames)) if newnames[i] is None]
+    if rows:
+        dirtyfiles = [files[i] for i in rows]
+        for i, n in zip(rows, compute_newnames(dirtyfiles, mod.update_filenames, filepart)):
+            newnames[i] = n
+    return newnames, start
+
+class PreviewScheduler:
+    """ Computes previews on a worker thread so that typing stays responsive
+
+        request() is called on every change. Requests are coalesced until
+        none has come in for delay ms, then prepare() is called on the main
+        thread to take a snapshot of the inputs and compute(job) runs on
+        the worker thread. The result is picked up by polling with after()
+        and handed to deliver(result, error) on the main thread, unless
+        another request came in since, in which case it is dropped.
+        onbusy(busy) is called when a computation starts and ends.
+    """
+    def __init__(self, widget, prepare, compute, deliver, onbusy=None, delay=150, interval=20):
+        self.widget = widget
+        self.prepare = prepare
+        self.compute = compute
+        self.deliver = deliver
+        self.onbusy = onbusy
+        self.delay = delay
+        self.interval = interval
+        self.generation = 0
+        self._pending = None
+        self._running = False
+        self._queued = False
+        self._results = queue.Queue()
+
+    def _set_busy(self, busy):
+        if self.onbusy:
+            self.onbusy(busy)
+
+    def request(self):
+        self.generation += 1
+        if self._pending is not None:
+            self.widget.after_cancel(self._pending)
+        self._pending = self.widget.after(self.delay, self._start)
+        self._set_busy(True)
+
+    def cancel(self):
+        """ Drops any pending or running computation """
+        self.generation += 1
+        if self._pending is not None:
+            self.widget.after_cancel(self._pending)
+            self._pending = None
+        self._queued = False
+        self._set_busy(False)
+
+    def run_now(self):
+        """ Computes the preview on the main thread for inputs too small
+            to be worth the worker, which drops any computation in progress
+        """
+        self.generation += 1
+        if self._pending is not None:
+            self.widget.after_cancel(self._pending)
+            self._pending = None
+        try:
+            result, error = self.compute(self.prepare()), None
+        except Exception as e:
+            result, error = None, e
+        self._set_busy(False)
+        self.deliver(result, error)
+
+    def _start(self):
+        self._pending = None
+        if self._running:
+            # The running computation is stale, start over once it is done
+            self._queued = True
+            return
+        self._running = True
+        self._queued = False
+        generation = self.generation
+        job = self.prepare()
+        worker = threading.Thread(target=self._run, args=(generation, job))
+        worker.daemon = True
+        worker.start()
+        self.widget.after(self.interval, self._poll)
+
+    def _run(self, generation, job):
+        try:
+            self._results.put((generation, self.compute(job), None))
+        except Exception as e:
+            self._results.put((generation, None, e))
+
+    def _poll(self):
+        try:
+            generation, result, error = self._results.get_nowait()
+        except queue.Empty:
+            self.widget.after(self.interval, self._poll)
+            return
+        self._running = False
+        if self._queued:
+            self._start()
+        elif generation == self.generation:
+            self._set_busy(False)
+            self.deliver(result, error)
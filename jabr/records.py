@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+import os
+
+class DirTable:
+    """ Interns directory paths so that files in the same directory
+        share one string
+    """
+    def __init__(self):
+        self._paths = {}
+
+    def __len__(self):
+        return len(self._paths)
+
+    def intern(self, dirpath):
+        return self._paths.setdefault(dirpath, dirpath)
+
+    def clear(self):
+        self._paths.clear()
+
+class FileRecord:
+    """ A file in Files.list
+
+        Only the directory path interned by a DirTable, the full name and
+        the identity of the file from jabr.statcache.get_identity are
+        stored, base, ext & fullpath are derived when read. Records can
+        still be read like the dicts Files.list used to hold, e.g.
+        record['base'], 'base' in record or record.get('base').
+    """
+    __slots__ = ('dirpath', 'fullname', 'identity')
+
+    KEYS = ('fullname', 'base', 'ext', 'fullpath', 'dirpath')
+
+    def __init__(self, dirpath, fullname, identity=None):
+        self.dirpath = dirpath
+        self.fullname = fullname
+        self.identity = identity
+
+    def __repr__(self):
+        return 'FileRecord({0!r})'.format(self.fullpath)
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key != 'fullname':
+            raise KeyError(key)
+        self.fullname = value
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def keys(self):
+        return self.KEYS
+
+    @property
+    def base(self):
+        return os.path.splitext(self.fullname)[0]
+
+    @property
+    def ext(self):
+        return os.path.splitext(self.fullname)[1][1:]
+
+    @property
+    def fullpath(self):
+        return os.path.join(self.dirpath, self.fullname)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+import re
+import threading
+
+try:
+    import re2 # A linear time engine, if installed
+except ImportError:
+    re2 = None
+
+class PatternTimeout(Exception):
+    """ Raised when a pattern goes over the time budget of a batch """
+
+def compile_linear(find):
+    """ Returns find compiled by a linear time engine,
+        or None if there is none or it does not support the pattern
+    """
+    if re2 is None:
+        return None
+    try:
+        return re2.compile(find)
+    except Exception:
+        return None
+
+def _serve(conn):
+    """ Runs in the worker process """
+    patterns = {}
+    while True:
+        try:
+            find, replacer, strings = conn.recv()
+        except EOFError:
+            return
+        try:
+            pattern = patterns.get(find)
+            if pattern is None:
+                pattern = patterns[find] = re.compile(find)
+            conn.send([pattern.sub(replacer, s) for s in strings])
+        except re.error as e:
+            conn.send(e)
+
+class GuardedRegex:
+    """ Runs re.sub in a worker process that is killed once a batch takes
+        longer than budget seconds, so that a pattern which backtracks
+        catastrophically cannot hang the application
+
+        Strings are sent in batches of up to batchsize characters and the
+        budget applies to each batch. A pattern that goes over it is
+        flagged and later calls with it raise PatternTimeout right away,
+        as does a pattern the worker dies running. A worker found dead
+        before a batch is sent is started again and the batch sent once more.
+    """
+    def __init__(self, budget=2.0, batchsize=1000000):
+        self.budget = budget
+        self.batchsize = batchsize
+        self.flagged = set()
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+
+    def _start(self):
+        import multiprocessing # Only needed once a risky pattern runs
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child,))
+        self._process.daemon = True
+        self._process.start()
+        child.close()
+
+    def close(self):
+        if self._process is None:
+            return
+        self._process.terminate()
+        self._process.join()
+        self._conn.close()
+        self._process = None
+        self._conn = None
+
+    def _send(self, message):
+        """ Sends a batch to the worker, starting it again if it died since
+            the last batch, then returns False if it could not be sent
+        """
+        if self._process is not None and not self._process.is_alive():
+            self.close()
+        for attempt in range(2):
+            if self._process is None:
+                self._start()
+            try:
+                self._conn.send(message)
+                return True
+            except OSError:
+                self.close()
+        return False
+
+    def _get_batches(self, strings):
+        batch = []
+        size = 0
+        for s in strings:
+            if batch and size + len(s) > self.batchsize:
+                yield batch
+                batch = []
+                size = 0
+            batch.append(s)
+            size += len(s)
+        if batch:
+            yield batch
+
+    def sub(self, find, replacer, strings):
+        """ Returns re.sub(find, replacer, s) for each of the strings """
+        with self._lock:
+            if find in self.flagged:
+                raise PatternTimeout(find)
+            results = []
+            for batch in self._get_batches(strings):
+                if not self._send((find, replacer, batch)):
+                    raise PatternTimeout(find)
+                try:
+                    done = self._conn.poll(self.budget)
+                    result = self._conn.recv() if done else None
+                except (EOFError, OSError):
+                    # The worker died running the pattern, e.g. killed for the memory it took
+                    done = False
+                if not done:
+                    self.close()
+                    self.flagged.add(find)
+                    raise PatternTimeout(find)
+                if isinstance(result, re.error):
+                    raise result
+                results.extend(result)
+            return results
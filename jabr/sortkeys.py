@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+import re
+
+from jabr.statcache import HAS_BIRTHTIME, FileStats, StatCache
+
+DIGITS = re.compile(r'(\d+)')
+
+def natural_key(name):
+    """ Returns a key sorting names the way people read them,
+        ignoring case & comparing runs of digits as numbers
+    """
+    parts = DIGITS.split(name.casefold())
+    # Split puts the runs of digits at the odd indices
+    parts[1::2] = [int(p) for p in parts[1::2]]
+    return tuple(parts)
+
+# name: key(file), or None for the keys read from the FileStats column
+# of the same name, in which files that are gone sort after the others
+KEYS = {
+    'natural': lambda f: natural_key(f['fullname']),
+    'folder': lambda f: (natural_key(f['dirpath']), natural_key(f['fullname'])),
+    'mtime': None,
+    'birthtime': None,
+    'size': None
+}
+
+class SortKeys:
+    """ Sorts files by one of KEYS
+
+        Files.list, given along with its version, is sorted by stats, the
+        jabr.statcache.FileStats Files keeps from adding the files, so that
+        sorting it never stats them again, other lists are stat'ed on
+        workers threads. Only the ranks of the last list sorted are kept,
+        along with the version given, so that previews of the same files
+        do not sort them again.
+    """
+    def __init__(self, workers=8, stats=None):
+        self.workers = workers
+        self.stats = stats
+        self._ranks = None
+
+    def get(self, files, kind, version=None):
+        """ Returns the key of the given kind of each of the files """
+        get_key = KEYS[kind]
+        if get_key is not None:
+            return [get_key(f) for f in files]
+        # A preview of a version files were removed from since is stat'ed
+        if version is not None and self.stats is not None and len(self.stats) >= len(files):
+            return self.stats.get(kind)[:len(files)]
+        paths = [f['fullpath'] for f in files]
+        stats = StatCache()
+        stats.prefetch(paths, self.workers)
+        column = FileStats.COLUMNS.index(kind)
+        return [FileStats.get_row(stats.get(p))[column] for p in paths]
+
+    def get_ranks(self, files, kind, version=None):
+        """ Returns the position of each of the files once sorted by the given
+            kind of key, files with equal keys keeping their order
+        """
+        if version is not None and self._ranks is not None and self._ranks[:2] == (kind, version):
+            return self._ranks[2]
+        keys = self.get(files, kind, version)
+        ranks = [0] * len(keys)
+        for rank, i in enumerate(sorted(range(len(keys)), key=keys.__getitem__)):
+            ranks[i] = rank
+        if version is not None:
+            self._ranks = (kind, version, ranks)
+        return ranks
+
+    def clear(self):
+        self._ranks = None
@@ -1,24 +1,249 @@
 #!/usr/bin/env python
 
+import copy
 import os
 import sys
 
+from jabr.parallel import ParallelTransformer
+from jabr.pipeline import Pipeline, Stage
+from jabr.preview import DuplicateIndex, PreviewCache, PreviewScheduler, compute_newnames, update_newnames
+from jabr.walk import Loader
+
 if sys.version_info[0] >= 3:
     # Python 3 or greater
     import tkinter
     import tkinter.filedialog as filedialog
+    import tkinter.font as font
     import tkinter.messagebox as messagebox
 else:
     import Tkinter as tkinter
     import tkFileDialog as filedialog
+    import tkFont as font
     import tkMessageBox as messagebox
 
+class VirtualListbox(tkinter.Listbox):
+    """ A Listbox that only holds the rows in view
+
+        Rows are read through get_row(i) and count() instead of being
+        stored in Tk, get_color(i) may return a foreground color for a row.
+        The selection is kept as a set of row numbers and scrollcommand
+        is called with the view as fractions of the whole list. The
+        keyboard bindings of Listbox are replaced so that they move the
+        selection kept here rather than the one of the rows in Tk.
+    """
+    def __init__(self, master=None, get_row=None, count=None, get_color=None, scrollcommand=None, onscroll=None, **kw):
+        tkinter.Listbox.__init__(self, master, **kw)
+        self.get_row = get_row
+        self.count = count
+        self.get_color = get_color
+        self.scrollcommand = scrollcommand
+        self.onscroll = onscroll if onscroll else self.yview
+        self.top = 0
+        self.visible = int(self.cget('height'))
+        self.selected = set()
+        self.anchor = 0
+        self.active = 0
+
+        self.bind('<Configure>', self._on_configure)
+        self.bind('<Button-1>', self._on_click)
+        self.bind('<Shift-Button-1>', self._on_shift_click)
+        self.bind('<Control-Button-1>', self._on_control_click)
+        self.bind('<B1-Motion>', self._on_drag)
+        self.bind('<MouseWheel>', self._on_wheel)
+        self.bind('<Button-4>', self._on_wheel)
+        self.bind('<Button-5>', self._on_wheel)
+        for sequence in ('<Up>', '<<PrevLine>>'):
+            self.bind(sequence, lambda _: self._on_key_move(-1))
+        for sequence in ('<Down>', '<<NextLine>>'):
+            self.bind(sequence, lambda _: self._on_key_move(1))
+        for sequence in ('<Shift-Up>', '<<SelectPrevLine>>'):
+            self.bind(sequence, lambda _: self._on_key_move(-1, extend=True))
+        for sequence in ('<Shift-Down>', '<<SelectNextLine>>'):
+            self.bind(sequence, lambda _: self._on_key_move(1, extend=True))
+        self.bind('<Control-Home>', lambda _: self._on_key_move(-self.count()))
+        self.bind('<Control-End>', lambda _: self._on_key_move(self.count()))
+        self.bind('<Control-Shift-Home>', lambda _: self._on_key_move(-self.count(), extend=True))
+        self.bind('<Control-Shift-End>', lambda _: self._on_key_move(self.count(), extend=True))
+        for sequence in ('<space>', '<Select>'):
+            self.bind(sequence, lambda _: self._on_key_move(0))
+        for sequence in ('<Control-Shift-space>', '<Shift-Select>'):
+            self.bind(sequence, lambda _: self._on_key_move(0, extend=True))
+        self.bind('<Prior>', lambda _: self._on_key_scroll(-1))
+        self.bind('<Next>', lambda _: self._on_key_scroll(1))
+        for sequence in ('<Control-slash>', '<<SelectAll>>'):
+            self.bind(sequence, self._on_select_all)
+        for sequence in ('<Control-backslash>', '<<SelectNone>>'):
+            self.bind(sequence, self._on_select_none)
+        self.bind('<Escape>', lambda _: 'break')
+
+    def _get_fractions(self, count):
+        if not count:
+            return (0.0, 1.0)
+        return (float(self.top) / count, min(1.0, float(self.top + self.visible) / count))
+
+    def _get_row_at(self, y):
+        row = self.top + tkinter.Listbox.nearest(self, y)
+        return max(0, min(row, self.count() - 1))
+
+    def _on_configure(self, event):
+        rowheight = font.Font(font=self.cget('font')).metrics('linespace') + 1
+        self.visible = max(1, event.height // rowheight)
+        self.refresh()
+
+    def _on_click(self, event):
+        self.focus_set()
+        if not self.count():
+            return 'break'
+        self.anchor = self.active = self._get_row_at(event.y)
+        self.select_rows((self.anchor,))
+        return 'break'
+
+    def _on_shift_click(self, event):
+        if not self.count():
+            return 'break'
+        self.active = self._get_row_at(event.y)
+        self.select_rows(range(min(self.anchor, self.active), max(self.anchor, self.active) + 1))
+        return 'break'
+
+    def _on_control_click(self, event):
+        if not self.count():
+            return 'break'
+        self.anchor = self.active = self._get_row_at(event.y)
+        self.selected.symmetric_difference_update((self.anchor,))
+        self.select_rows(self.selected)
+        return 'break'
+
+    def _on_drag(self, event):
+        if not self.count():
+            return 'break'
+        # Dragging past either edge scrolls the view
+        if event.y < 0:
+            self.onscroll('scroll', -1, 'units')
+        elif event.y > self.winfo_height():
+            self.onscroll('scroll', 1, 'units')
+        return self._on_shift_click(event)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self.onscroll('scroll', -3, 'units')
+        else:
+            self.onscroll('scroll', 3, 'units')
+        return 'break'
+
+    def _on_key_move(self, step, extend=False):
+        """ Moves the active row by step, selecting it,
+            or the rows from the anchor to it if extend is set
+        """
+        count = self.count()
+        if not count:
+            return 'break'
+        self.active = max(0, min(self.active + step, count - 1))
+        if not extend:
+            self.anchor = self.active
+        self.see(self.active)
+        self.select_rows(range(min(self.anchor, self.active), max(self.anchor, self.active) + 1))
+        return 'break'
+
+    def _on_key_scroll(self, pages):
+        self.onscroll('scroll', pages, 'pages')
+        return 'break'
+
+    def _on_select_all(self, event):
+        self.select_rows(range(self.count()))
+        return 'break'
+
+    def _on_select_none(self, event):
+        self.select_rows(())
+        return 'break'
+
+    def refresh(self, first=0):
+        """ Redraws the rows in view from the model, only those from row
+            first onwards if the rows before it are known to be unchanged
+        """
+        count = self.count()
+        top = max(0, min(self.top, count - self.visible))
+        if top != self.top:
+            self.top = top
+            first = 0
+        end = min(count, top + self.visible + 1)
+        first = min(max(first, top), top + tkinter.Listbox.size(self))
+        tkinter.Listbox.delete(self, first - top, 'end')
+        if end > first:
+            tkinter.Listbox.insert(self, 'end', *[self.get_row(i) for i in range(first, end)])
+        for i in range(first, end):
+            color = self.get_color(i) if self.get_color else None
+            if color:
+                tkinter.Listbox.itemconfig(self, i - top, fg=color)
+            if i in self.selected:
+                tkinter.Listbox.selection_set(self, i - top)
+        if self.scrollcommand:
+            self.scrollcommand(*self._get_fractions(count))
+
+    def yview(self, *args):
+        count = self.count()
+        if not args:
+            return self._get_fractions(count)
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * count)
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2].startswith('page'):
+                step *= self.visible
+            self.top += step
+        self.refresh()
+
+    def see(self, index):
+        """ Scrolls the view to the given row if it is out of it """
+        if index < self.top:
+            self.onscroll('scroll', index - self.top, 'units')
+        elif index >= self.top + self.visible:
+            self.onscroll('scroll', index - self.top - self.visible + 1, 'units')
+
+    def curselection(self):
+        return tuple(sorted(self.selected))
+
+    def selection_clear(self, first=0, last='end'):
+        if first == 0 and last == 'end':
+            self.selected.clear()
+        else:
+            self.selected.difference_update(range(first, (first if last is None else last) + 1))
+        self.refresh()
+
+    def selection_set(self, first, last=None):
+        self.selected.update(range(first, (first if last is None else last) + 1))
+        self.refresh()
+
+    def select_rows(self, rows):
+        """ Replaces the selection with the given rows
+            then lets the bindings of <<ListboxSelect>> know about it
+        """
+        self.selected = set(rows)
+        self.refresh()
+        self.event_generate('<<ListboxSelect>>')
+
 class TkUI(tkinter.Tk):
+    # Sessions up to this many files are previewed without the worker thread
+    SYNC_PREVIEW_LIMIT = 2000
+
     def __init__(self, parent, jabr):
         tkinter.Tk.__init__(self, parent)
         self.tkinter = tkinter
         self.parent = parent
         self.jabr = jabr
+        self.newnames = []
+        self.newnames_key = None
+        self.pipeline = Pipeline()
+        self.transformer = ParallelTransformer()
+        self.duplicates = DuplicateIndex()
+        self.preview_cache = PreviewCache()
+        self.previewer = PreviewScheduler(
+            self,
+            self.prepare_newnames,
+            self.compute_newnames,
+            self.deliver_newnames,
+            onbusy=self.show_busy
+        )
+        self.loader = Loader(self, self.add_entries, onprogress=self.show_loading)
 
         self.initialize_ui()
 
@@ -56,29 +281,59 @@ class TkUI(tkinter.Tk):
         about_grp.grid_columnconfigure(1, weight=1)
         self.about.grid_columnconfigure(0, weight=1)
 
-        # Add, Remove, Clear & About buttons
+        # Add, Folder, Remove, Clear & About buttons
         add_files_btn = tkinter.Button(self, text='Add', command=self.add_files, width=6)
         add_files_btn.grid(column=0, row=0, sticky='w')
 
+        # Turns into a Cancel button while a folder loads
+        self.add_folder_btn = tkinter.Button(self, text='Folder', command=self.add_folder, width=6)
+        self.add_folder_btn.grid(column=1, row=0, sticky='w')
+
         rem_files_btn = tkinter.Button(self, text='Remove', command=self.remove_files, width=6)
-        rem_files_btn.grid(column=1, row=0, sticky='w')
+        rem_files_btn.grid(column=2, row=0, sticky='w')
 
         clr_files_btn = tkinter.Button(self, text='Clear', command=self.clear_files, width=6)
-        clr_files_btn.grid(column=2, row=0, sticky='w')
+        clr_files_btn.grid(column=3, row=0, sticky='w')
+
+        stack_btn = tkinter.Button(self, text='Stack', command=self.stack_module, width=6)
+        stack_btn.grid(column=4, row=0, sticky='w')
+
+        unstack_btn = tkinter.Button(self, text='Unstack', command=self.unstack_modules, width=6)
+        unstack_btn.grid(column=5, row=0, sticky='w')
+
+        self.stack_label = tkinter.Label(self, text='')
+        self.stack_label.grid(column=6, row=0, columnspan=13, sticky='w')
 
         abt_btn = tkinter.Button(self, text='About', command=self.show_about, width=6)
         abt_btn.grid(column=19, row=0, columnspan=2, sticky='e')
 
         # Before & After Listboxes
-        self.oldname_lstbx = tkinter.Listbox(selectmode='extended', exportselection=0, width=28)
+        self.oldname_lstbx = VirtualListbox(
+            self,
+            get_row=lambda i: self.jabr.files.list[i]['fullname'],
+            count=lambda: len(self.jabr.files.list),
+            scrollcommand=lambda *args: self.listbox_scrollbar.set(*args),
+            onscroll=self.yscroll,
+            selectmode='extended',
+            exportselection=0,
+            width=28
+        )
         self.oldname_lstbx.grid(column=0, row=1, columnspan=10, sticky='news')
         self.oldname_lstbx.bind('<<ListboxSelect>>', self.sync_selection)
-        self.oldname_lstbx.configure(yscrollcommand=lambda *args: self.listbox_scrollbar.set(*args))
 
-        self.newname_lstbx = tkinter.Listbox(selectmode='extended', exportselection=0, width=28)
+        self.newname_lstbx = VirtualListbox(
+            self,
+            get_row=lambda i: self.newnames[i],
+            count=lambda: len(self.newnames),
+            get_color=lambda i: 'red' if self.duplicates.is_duplicate(i) else None,
+            scrollcommand=lambda *args: self.listbox_scrollbar.set(*args),
+            onscroll=self.yscroll,
+            selectmode='extended',
+            exportselection=0,
+            width=28
+        )
         self.newname_lstbx.grid(column=10, row=1, columnspan=10, sticky='news')
         self.newname_lstbx.bind('<<ListboxSelect>>', self.sync_selection)
-        self.newname_lstbx.configure(yscrollcommand=lambda *args: self.listbox_scrollbar.set(*args))
 
         self.listbox_scrollbar = tkinter.Scrollbar(orient='vertical', command=self.yscroll)
         self.listbox_scrollbar.grid(column=20, row=1, sticky='nes')
@@ -101,6 +356,10 @@ class TkUI(tkinter.Tk):
         self.rename_btn.config(state='disabled')
         self.rename_btn.grid(column=19, row=4, columnspan=2, sticky='e', padx=5, pady=(0, 5))
 
+        # Preview Status
+        self.status_label = tkinter.Label(self, text='')
+        self.status_label.grid(column=0, row=4, columnspan=10, sticky='w', padx=5, pady=(0, 5))
+
         # Initialize module options & group
         self.rename_mod_optionmenu = tkinter.Frame(self)
         self.module_grp = tkinter.LabelFrame(self, padx=5, pady=5)
@@ -148,34 +407,69 @@ class TkUI(tkinter.Tk):
     def add_files(self):
         files = filedialog.askopenfilenames(title='Select files to rename')
         files = self.tk.splitlist(files) # Windows fix
-        addedfiles = self.jabr.files.add(files)
-        for af in addedfiles:
-            filename = os.path.basename(af)
-            self.oldname_lstbx.insert('end', filename)
+        self.jabr.files.add(files)
+        self.oldname_lstbx.refresh()
+        self.update_newnames()
+
+    def add_folder(self):
+        """ Adds every file under a folder, walked on a worker thread,
+            or cancels the folder being added
+        """
+        if self.loader.running:
+            self.loader.cancel()
+            return
+        directory = filedialog.askdirectory(title='Select a folder to rename the files in')
+        if not directory:
+            return
+        self.add_folder_btn.config(text='Cancel')
+        self.rename_btn.config(state='disabled')
+        self.loader.start([os.path.abspath(directory)])
+
+    def add_entries(self, entries):
+        """ Adds a batch of the folder being loaded, dropping any preview
+            made for fewer files, the new names are computed once it is done
+        """
+        self.previewer.cancel()
+        start = len(self.jabr.files.list)
+        self.jabr.files.add_entries(entries)
+        self.oldname_lstbx.refresh(start)
+
+    def show_loading(self, count, done):
+        if not done:
+            self.status_label.config(text='Found {0} files\u2026'.format(count))
+            return
+        self.add_folder_btn.config(text='Folder')
+        self.status_label.config(text='')
         self.update_newnames()
 
     def remove_files(self):
         files = self.oldname_lstbx.curselection()
         self.jabr.files.remove(files)
-        for f in reversed(files):
-            self.oldname_lstbx.delete(f)
-            self.newname_lstbx.delete(f)
+        self.oldname_lstbx.selection_clear(0, 'end')
         self.update_newnames()
 
     def clear_files(self):
+        self.loader.cancel()
+        self.previewer.cancel()
         self.jabr.files.clear()
-        self.oldname_lstbx.delete(0, 'end')
-        self.newname_lstbx.delete(0, 'end')
+        self.newnames = []
+        self.newnames_key = None
+        self.duplicates.reset()
+        self.oldname_lstbx.selection_clear(0, 'end')
+        self.newname_lstbx.selection_clear(0, 'end')
         self.rename_btn.config(state='disabled')
 
     def rename_files(self):
-        newnames = self.newname_lstbx.get(0, 'end')
-        output = self.jabr.files.rename(newnames)
+        if len(self.newnames) != len(self.jabr.files.list):
+            self.show_error('The new names are out of date. No file has been renamed.')
+            self.update_newnames()
+            return
+        output = self.jabr.files.rename(self.newnames)
 
-        self.oldname_lstbx.delete(0, 'end')
-        self.newname_lstbx.delete(0, 'end')
-        for r in output['newoldnames']:
-            self.oldname_lstbx.insert('end', r)
+        # Files.list now holds the names in output['newoldnames']
+        self.newnames = []
+        self.newnames_key = None
+        self.oldname_lstbx.refresh()
 
         if (output['errormsg']):
             self.show_error(output['errormsg'], output['errorlog'])
@@ -196,64 +490,173 @@ class TkUI(tkinter.Tk):
             self.initialize_rename_mod_optionmenu()
         self.update_newnames()
 
-    def update_newnames(self, *_):
-        """ Gets the part of the file to be renamed,
-            sends it to the selected module's 'update_filenames' function,
-            then inserts the results into newname_lstbx
+    def stack_module(self):
+        """ Adds the selected module with a copy of its current config
+            to the stack, which runs before the selected module
+        """
+        mod = self.jabr.mods[self.rename_mod_var.get()]['object']
+        self.pipeline.add(mod, self.get_mod_config(mod))
+        self.show_stack()
+        self.update_newnames()
+
+    def unstack_modules(self):
+        self.pipeline.clear()
+        self.show_stack()
+        self.update_newnames()
+
+    def show_stack(self, timings=None):
+        """ Shows the stacked modules, or the time each stage of
+            the last preview took if timings are given
         """
-        newnames = []
-        filepart = 'fullname'
-        module = self.jabr.mods[self.rename_mod_var.get()]
+        if timings:
+            labels = ['{0} {1:.1f} ms'.format(label, seconds * 1000) for label, seconds in timings]
+            self.stack_label.config(text=' \u2192 '.join(labels))
+            return
+        labels = [s.LABEL for s in self.pipeline.stages]
+        self.stack_label.config(text=' \u2192 '.join(labels + ['']) if labels else '')
 
+    def get_mod_config(self, mod):
+        """ Returns the config a module's UI edits, None for its default """
+        return getattr(getattr(mod, 'module', None), 'config', None)
+
+    def get_rename_mod(self):
+        """ Returns the selected module bound to a copy of the config in its UI,
+            run after the stacked modules if any
+        """
+        mod = self.jabr.mods[self.rename_mod_var.get()]['object']
+        stage = Stage(mod, self.get_mod_config(mod))
+        if not self.pipeline.stages:
+            return stage
+        # Copies, as each preview gets the stages data about its own files
+        return Pipeline([copy.copy(s) for s in self.pipeline.stages] + [stage])
+
+    def update_newnames(self, *_):
+        """ Shows the cached preview of the new names if there is one,
+            otherwise schedules it, which is computed right away for
+            small sessions and on a worker thread otherwise or if the
+            modules read the files
+        """
         self.oldname_lstbx.selection_clear(0, 'end')
         self.newname_lstbx.selection_clear(0, 'end')
+        mod = self.get_rename_mod()
+        key = self.get_preview_key(mod)
+        newnames = self.preview_cache.get(key)
+        reads_files = any(hasattr(s.mod, 'get_filedata') for s in getattr(mod, 'stages', [mod]))
+        if newnames is not None:
+            self.previewer.cancel()
+            self.show_stack()
+            self.newnames_key = key
+            self.show_newnames(list(newnames))
+        elif len(self.jabr.files.list) <= self.SYNC_PREVIEW_LIMIT and not reads_files:
+            self.previewer.run_now()
+        else:
+            self.previewer.request()
+
+    def get_filepart(self):
         if self.filepart_var.get() == self.filepart_options[0]:
-            filepart = 'base'
+            return 'base'
         if self.filepart_var.get() == self.filepart_options[1]:
-            filepart = 'ext'
-        newnames = [f[filepart] for f in self.jabr.files.list]
-        if not newnames:
-            return
-
-        try:
-            newnames = module['object'].update_filenames(newnames)
-        except Exception as e:
-            self.show_error(': '.join([self.rename_mod_var.get(), str(e)]))
+            return 'ext'
+        return 'fullname'
+
+    def get_preview_key(self, mod=None):
+        mod = mod if mod is not None else self.get_rename_mod()
+        return self.preview_cache.get_key(mod, self.get_filepart(), self.jabr.files.version)
+
+    def prepare_newnames(self):
+        """ Gets the selected module and the part of the file to be renamed
+            along with a snapshot of the files for compute_newnames, and
+            the changes made to the files since the shown preview if it
+            was made with the same settings
+        """
+        mod = self.get_rename_mod()
+        key = self.get_preview_key(mod)
+        changes = None
+        if key is not None and self.newnames_key is not None and key[:-1] == self.newnames_key[:-1]:
+            changes = self.jabr.files.get_changes(self.newnames_key[-1])
+        return {
+            'key': key,
+            'base': self.newnames_key,
+            'newnames': self.newnames,
+            'changes': changes,
+            'module': mod,
+            'filepart': self.get_filepart(),
+            'files': list(self.jabr.files.list),
+            'version': self.jabr.files.version
+        }
+
+    def compute_newnames(self, job):
+        """ Sends the part of the file to be renamed to the selected
+            module's 'update_filenames' function, only for the rows the
+            changes left dirty if the module allows it, or spread over
+            worker processes for large lists, may run on a worker thread
+
+            Modules that sort the files or read them get that data first,
+            from the session's sort keys & stats.
+        """
+        mod = job['module']
+        mod.prepare(job['files'], self.jabr.files.sortkeys, job['version'])
+        result = None
+        if job['changes'] is not None:
+            result = update_newnames(job['files'], mod, job['filepart'], job['newnames'], job['changes'])
+        if result is None:
+            newnames, start = compute_newnames(job['files'], self.transformer.bind(mod), job['filepart']), None
+        else:
+            newnames, start = result
+        # mod is a new Pipeline for each preview when modules are stacked
+        timings = mod.get_timings() if isinstance(mod, Pipeline) else None
+        return { 'key': job['key'], 'base': job['base'], 'newnames': newnames, 'start': start, 'timings': timings }
+
+    def deliver_newnames(self, result, error):
+        """ Caches & shows the computed new names, with the time each
+            stage took if modules are stacked, or reports the error
+            the selected module raised computing them
+        """
+        if error is not None:
+            self.show_error(': '.join([self.rename_mod_var.get(), str(error)]))
             self.jabr.remove_mod(self.rename_mod_var.get())
             self.initialize_rename_mod_optionmenu()
+            return
+        self.preview_cache.put(result['key'], result['newnames'])
+        # The rows before start are only known to be unchanged from the preview it was based on
+        start = result['start'] if result['base'] == self.newnames_key else None
+        self.newnames_key = result['key']
+        self.show_stack(result['timings'])
+        self.show_newnames(result['newnames'], start)
+
+    def show_busy(self, busy):
+        self.status_label.config(text='Computing\u2026' if busy else '')
+        if busy:
+            self.rename_btn.config(state='disabled')
 
-        self.newname_lstbx.delete(0, 'end')
-        for i, f in enumerate(self.jabr.files.list):
-            if filepart == 'base':
-                if f['ext']:
-                    newnames[i] = '.'.join([newnames[i], f['ext']])
-            elif filepart == 'ext':
-                if newnames[i]:
-                    newnames[i] = '.'.join([f['base'], newnames[i]])
-            if f['fullname'] == newnames[i]:
-                newnames[i] = ''
-
-            self.newname_lstbx.insert('end', newnames[i])
-
-        self.validate_newnames(newnames)
-
-    def validate_newnames(self, newnames):
-        """ Gets a set of non-unique entries and counts the number
-            of blanks in newnames in order to highlight duplicate entries
-            and set the state for the Rename button
+    def show_newnames(self, newnames, start=None):
+        """ Redraws newname_lstbx from the new names, only from row start
+            onwards if the rows before it are known to be unchanged
         """
-        blanks = 0
-        duplicates = {n for n in newnames if newnames.count(n) > 1 and n}
-        self.rename_btn.config(state='normal')
-        for i, n in enumerate(newnames):
-            if not n:
-                blanks += 1
-            if n in duplicates:
-                self.rename_btn.config(state='disabled')
-                self.newname_lstbx.itemconfig(i, fg='red')
-
-        if blanks == len(newnames):
-            self.rename_btn.config(state='disabled')
+        if start is not None:
+            changed = self.duplicates.splice(start, newnames[start:])
+            oldstart = start
+        else:
+            if len(newnames) != len(self.newnames):
+                self.duplicates.reset(len(newnames))
+                changed = set(range(len(newnames)))
+            else:
+                changed = {i for i, n in enumerate(newnames) if n != self.newnames[i]}
+            changed.update(self.duplicates.update((i, newnames[i]) for i in changed))
+            start = min(changed) if changed else len(newnames)
+            oldstart = 0
+        self.newnames = newnames
+        self.validate_newnames()
+        self.oldname_lstbx.refresh(oldstart)
+        self.newname_lstbx.refresh(min(changed.union((start,))))
+
+    def validate_newnames(self):
+        """ Sets the state for the Rename button from the duplicate index,
+            which also highlights duplicate entries when newname_lstbx is redrawn,
+            keeping it disabled while a folder is being added
+        """
+        valid = self.duplicates.is_valid() and not self.loader.running
+        self.rename_btn.config(state='normal' if valid else 'disabled')
 
     def sync_selection(self, event):
         """ Gets the active ListBox selection,
@@ -262,15 +665,10 @@ class TkUI(tkinter.Tk):
         """
         evt = event.widget
         lstbx = self.oldname_lstbx
-        curselection = evt.curselection()
-
-        if curselection == self.oldname_lstbx.curselection():
+        if evt is self.oldname_lstbx:
             lstbx = self.newname_lstbx
-        lstbx.selection_clear(0, 'end')
-
-        for i in curselection:
-            self.newname_lstbx.selection_set(i)
-            self.oldname_lstbx.selection_set(i)
+        lstbx.selected = set(evt.selected)
+        lstbx.refresh()
 
     def yscroll(self, *args):
         self.oldname_lstbx.yview(*args)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+# Imported on first use, as NumPy takes longer to import than the rest of jabr
+numpy = None
+_imported = False
+
+# The fewest names for which each operation is worth converting them to
+# an array and back, see test_jabr_vectorized_performance. NumPy 2.x's
+# case functions are slower than str's and its slicing no faster than
+# the Python loops once the conversion is counted, so only the counters
+# of Numbering are on by default.
+MIN_ITEMS = { 'number': 5000 }
+
+def _import_numpy():
+    global numpy, _imported
+    if not _imported:
+        _imported = True
+        try:
+            import numpy as module
+        except ImportError:
+            return False
+        if hasattr(getattr(module, 'strings', None), 'slice'):
+            numpy = module
+    return numpy is not None
+
+def is_available(operation=None, count=0):
+    """ Returns True if NumPy's string functions are installed
+        and, if operation is given, count is enough names to be worth them
+    """
+    if operation is not None and count < MIN_ITEMS.get(operation, float('inf')):
+        return False
+    return _import_numpy()
+
+def _array(files):
+    return numpy.array(files, dtype=str)
+
+def _get_nonascii(names):
+    """ Returns the indexes of the names with characters outside ASCII """
+    if not names.size or not names.itemsize:
+        return []
+    codes = names.view(numpy.uint32).reshape(names.size, -1)
+    return numpy.flatnonzero(codes.max(axis=1) > 127).tolist()
+
+def change_case(files, case):
+    """ Returns the files in 'title', 'lower' or 'upper' case """
+    names = _array(files)
+    newnames = getattr(numpy.strings, case)(names).tolist()
+    # Outside ASCII a name can get longer, as 'ß' does in upper case,
+    # which the array's fixed width would cut short
+    for i in _get_nonascii(names):
+        newnames[i] = getattr(files[i], case)()
+    return newnames
+
+def insert(files, text, position, from_right=False):
+    """ Inserts text at position counted from the left or the right,
+        files shorter than position are left as they are
+    """
+    names = _array(files)
+    lengths = numpy.strings.str_len(names)
+    at = lengths - position if from_right else numpy.full(len(names), position)
+    at = numpy.clip(at, 0, None)
+    inserted = numpy.strings.add(numpy.strings.add(numpy.strings.slice(names, 0, at), text), numpy.strings.slice(names, at, lengths))
+    return numpy.where(lengths < position, names, inserted).tolist()
+
+def remove(files, start, end, from_right=False):
+    """ Removes the characters from start to end counted from the left,
+        or keeps the last start characters before dropping the last end ones
+        counted from the right, like the Remove Characters module
+    """
+    names = _array(files)
+    lengths = numpy.strings.str_len(names)
+    if not from_right:
+        head = numpy.strings.slice(names, 0, numpy.minimum(start, lengths))
+        tail = numpy.strings.slice(names, numpy.minimum(end, lengths), lengths)
+        return numpy.strings.add(head, tail).tolist()
+    head = numpy.strings.slice(names, 0, numpy.clip(lengths - end, 0, None))
+    if start == 0:
+        return head.tolist()
+    tail = numpy.strings.slice(names, numpy.clip(lengths - start, 0, None), lengths)
+    return numpy.strings.add(head, tail).tolist()
+
+def number(files, numbers, width, text, parts):
+    """ Joins the parts of each new name in order, where a part is 'name'
+        for the file's name, 'text' for text or 'number' for the file's
+        number zero padded to width digits
+    """
+    if not files:
+        return []
+    names = _array(files)
+    if isinstance(numbers, range):
+        numbers = numpy.arange(numbers.start, numbers.stop)
+    numbers = numpy.strings.zfill(numpy.asarray(numbers).astype(str), width)
+    joined = numpy.full(len(names), '', dtype=str)
+    for part in parts:
+        if part == 'name':
+            joined = numpy.strings.add(joined, names)
+        elif part == 'number':
+            joined = numpy.strings.add(joined, numbers)
+        else:
+            joined = numpy.strings.add(joined, text)
+    return joined.tolist()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+import fnmatch
+import itertools
+import os
+import re
+import stat
+import sys
+import threading
+
+if sys.version_info[0] >= 3:
+    import queue
+else:
+    import Queue as queue
+
+def compile_globs(patterns):
+    """ Returns a function telling if a name matches any of the glob
+        patterns, or None if there are no patterns
+    """
+    if not patterns:
+        return None
+    regex = re.compile('|'.join(fnmatch.translate(os.path.normcase(p)) for p in patterns))
+    return lambda name: regex.match(os.path.normcase(name)) is not None
+
+def is_hidden(entry):
+    """ Returns True for dot files, and for files with the hidden
+        attribute on Windows, whose scandir entries hold it without a stat
+    """
+    if entry.name.startswith('.'):
+        return True
+    if os.name != 'nt':
+        return False
+    return bool(entry.stat(follow_symlinks=False).st_file_attributes & stat.FILE_ATTRIBUTE_HIDDEN)
+
+def walk(top, include=(), exclude=(), maxdepth=None, hidden=False, onerror=None, cancel=None):
+    """ Yields (dirpath, name, path, entry) for each file under top, entry
+        being its os.DirEntry, taking the names & types from the entries
+        os.scandir reads with each directory instead of splitting paths
+        & calling stat
+
+        include & exclude are glob patterns matched against names, a file
+        being yielded if it matches any of include, if given, and none of
+        exclude. Directories matching exclude are skipped whole. Files up
+        to maxdepth directories below top are yielded, all of them if it
+        is None. Hidden files & directories are skipped unless hidden is
+        True. Symbolic links are yielded as files and never followed.
+        Each directory's files are yielded in sorted order before the
+        directories in it are walked.
+
+        onerror is called with the OSError of a directory that cannot be
+        read. The walk stops once cancel, a threading.Event, is set.
+    """
+    included = compile_globs(include)
+    excluded = compile_globs(exclude)
+    stack = [(top, 0)]
+    while stack:
+        if cancel is not None and cancel.is_set():
+            return
+        dirpath, depth = stack.pop()
+        try:
+            with os.scandir(dirpath) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            if not hidden and is_hidden(entry):
+                continue
+            if excluded is not None and excluded(name):
+                continue
+            try:
+                isdir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                isdir = False
+            if isdir:
+                if maxdepth is None or depth < maxdepth:
+                    subdirs.append(entry.path)
+            elif included is None or included(name):
+                yield dirpath, name, entry.path, entry
+        stack.extend((d, depth + 1) for d in reversed(subdirs))
+
+class Loader:
+    """ Walks directories on a worker thread and hands the files found to
+        add(entries) on the main thread, polling with after() so that the
+        window stays responsive while a large tree loads
+
+        The worker stays at most maxbatches batches of batchsize files
+        ahead of the main thread. onprogress(count, done) is called with
+        the number of files handed over after each poll. cancel() stops
+        the walk, the files handed over so far are kept.
+    """
+    def __init__(self, widget, add, onprogress=None, batchsize=10000, maxbatches=16, interval=50):
+        self.widget = widget
+        self.add = add
+        self.onprogress = onprogress
+        self.batchsize = batchsize
+        self.interval = interval
+        self.count = 0
+        self.running = False
+        self._cancel = threading.Event()
+        self._batches = queue.Queue(maxbatches)
+
+    def start(self, tops, **options):
+        """ Walks each of the directories in tops, see walk for options """
+        if self.running:
+            raise RuntimeError('A walk is already running')
+        self.running = True
+        self.count = 0
+        self._cancel = threading.Event()
+        self._batches = queue.Queue(self._batches.maxsize)
+        worker = threading.Thread(target=self._run, args=(tops, options, self._cancel, self._batches))
+        worker.daemon = True
+        worker.start()
+        self.widget.after(self.interval, self._poll)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _put(self, batches, item, cancel):
+        while not cancel.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self, tops, options, cancel, batches):
+        try:
+            entries = itertools.chain.from_iterable(walk(t, cancel=cancel, **options) for t in tops)
+            while True:
+                batch = list(itertools.islice(entries, self.batchsize))
+                if not batch or not self._put(batches, batch, cancel):
+                    break
+        finally:
+            # Always gets through, the main thread drains the queue until it does
+            while True:
+                try:
+                    batches.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def _poll(self):
+        received = []
+        done = False
+        while True:
+            try:
+                batch = self._batches.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                done = True
+                break
+            if not self._cancel.is_set():
+                received.append(batch)
+        if received:
+            self.count += sum(len(b) for b in received)
+            self.add(itertools.chain.from_iterable(received))
+        if done:
+            self.running = False
+        else:
+            self.widget.after(self.interval, self._poll)
+        if self.onprogress:
+            self.onprogress(self.count, done)
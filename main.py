@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 
+import multiprocessing
+
 import jabr.main
 
 if __name__ == "__main__":
+    # Lets frozen builds start the worker processes of jabr.parallel
+    multiprocessing.freeze_support()
     jabr.main.start()
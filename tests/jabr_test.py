@@ -2,12 +2,22 @@
 
 # This script is for automatically testing the functionality of JABR and Files
 
+import copy
 import datetime
+import hashlib
 import importlib
+import io
 import os
+import pickle
 import random
+import re
 import shutil
+import subprocess
 import sys
+import tempfile
+import threading
+import tracemalloc
+import time
 import timeit
 import unittest
 
@@ -15,6 +25,21 @@ jabr_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(jabr_path)
 
 import jabr.main
+from jabr import cli
+from jabr import digests
+from jabr import executor
+from jabr import fsops
+from jabr import manifest
+from jabr import planner
+from jabr import regexguard
+from jabr import vectorized
+from jabr import walk
+from jabr.dirindex import DirIndex
+from jabr import modapi
+from jabr.parallel import ParallelTransformer
+from jabr.pipeline import Pipeline, Stage
+from jabr.preview import DuplicateIndex, PreviewCache, PreviewScheduler, compute_newnames, iter_newnames, update_newnames
+from jabr.sortkeys import HAS_BIRTHTIME, SortKeys, natural_key
 
 class Test_Data():
     def __init__(self, num=0, rand=False):
@@ -48,6 +73,44 @@ class Test_Data():
         with open(self.logfile, 'a') as testlog:
             testlog.write('LOG:{0}:{1}: {2}\n'.format(datetime.datetime.now(), unit, log))
 
+class Latency_FileSystem(fsops.FileSystem):
+    """ Adds a fixed delay to every rename like a network filesystem would """
+    def __init__(self, latency):
+        fsops.FileSystem.__init__(self)
+        self.latency = latency
+
+    def rename(self, src, dst, src_dir_fd=None, dst_dir_fd=None):
+        time.sleep(self.latency)
+        fsops.FileSystem.rename(self, src, dst, src_dir_fd, dst_dir_fd)
+
+class Upper_Module():
+    """ Upper cases names and keeps the names it was given """
+    POSITIONAL = False
+
+    def __init__(self):
+        self.computed = []
+
+    def update_filenames(self, files, offset=0):
+        self.computed.extend(files)
+        return [f.upper() for f in files]
+
+class After_Queue():
+    """ Stands in for the Tk event loop by running after() callbacks in order """
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+        return callback
+
+    def after_cancel(self, callback):
+        self.callbacks.remove(callback)
+
+    def run(self):
+        while self.callbacks:
+            self.callbacks.pop(0)()
+            time.sleep(0.001)
+
 class JAR_Test(unittest.TestCase):
     def setUp(self):
         files = 8
@@ -76,6 +139,210 @@ class JAR_Test(unittest.TestCase):
         self.assertEqual(self.testdata.jabr.files.list[rand_index]['base'], base)
         self.assertEqual(self.testdata.jabr.files.list[rand_index]['ext'], ext[1:])
         self.assertEqual(self.testdata.jabr.files.list[rand_index]['dirpath'], dirpath)
+        record = self.testdata.jabr.files.list[rand_index]
+        self.assertTrue('base' in record and 'size' not in record)
+        self.assertEqual((record.get('base'), record.get('size'), record.get('size', 0)), (base, None, 0))
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_add_iter(self):
+        unit = 'JABR Add Iter'
+        files = self.testdata.jabr.files
+        version = files.version
+        count = len(files.list)
+        progress = []
+        self.testdata.log(unit, 'Streaming files with duplicates into JABR in batches')
+        new_files = (f for f in self.testdata.get_test_file(6) + self.testdata.files + [os.path.abspath('streamed')])
+        self.assertEqual(files.add_iter(new_files, batchsize=5, progress=lambda *p: progress.append(p)), 1)
+        self.assertEqual(len(files.list), count + 1)
+        self.assertEqual(progress[-1], (len(self.testdata.files) + 7, 1))
+        self.assertEqual(len(progress), -(-(len(self.testdata.files) + 7) // 5))
+        self.assertEqual(files.get_changes(version), [('add', range(count, count + 1))])
+
+        self.testdata.log(unit, 'Reading paths split across the chunks of a stream')
+        stream = io.BytesIO(b'a\r\nbb\n\nccc\ndd')
+        self.assertEqual(list(cli.iter_paths(stream, chunksize=3)), ['a', 'bb', 'ccc', 'dd'])
+        stream = io.BytesIO(b'a\nb\0\0c\0')
+        self.assertEqual(list(cli.iter_paths(stream, null=True, chunksize=2)), ['a\nb', 'c'])
+
+        self.testdata.log(unit, 'Streaming the new names in chunks')
+        stage = Stage(self.testdata.jabr.mods['Numbering']['object'], { 'format': 1 })
+        expected = compute_newnames(files.list, stage.update_filenames, 'base')
+        self.assertEqual(list(iter_newnames(files.list, stage.update_filenames, 'base', True, chunksize=2)), expected)
+        out = io.BytesIO()
+        cli.write_plan(out, files.list, iter(expected), null=True)
+        self.assertEqual(out.getvalue().split(b'\0')[:2], [os.fsencode(files.list[0]['fullpath']), os.fsencode(os.path.join(files.list[0]['dirpath'], expected[0]))])
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_walk(self):
+        unit = 'JABR Walk'
+        tempdir = tempfile.mkdtemp()
+        try:
+            for dirpath in ('a', os.path.join('a', 'b'), 'skip', '.hidden'):
+                os.mkdir(os.path.join(tempdir, dirpath))
+            for path in ('1.txt', '2.jpg', '.dot.txt', os.path.join('a', '3.txt'), os.path.join('a', 'b', '4.txt'), os.path.join('skip', '5.txt'), os.path.join('.hidden', '6.txt')):
+                open(os.path.join(tempdir, path), 'w').close()
+            names = lambda **options: [entry[1] for entry in walk.walk(tempdir, **options)]
+
+            self.testdata.log(unit, 'Walking a tree with filters, a depth limit & hidden files')
+            self.assertEqual(names(), ['1.txt', '2.jpg', '3.txt', '4.txt', '5.txt'])
+            self.assertEqual(names(include=['*.txt'], exclude=['skip', '3*']), ['1.txt', '4.txt'])
+            self.assertEqual(names(maxdepth=1), ['1.txt', '2.jpg', '3.txt', '5.txt'])
+            self.assertEqual(names(maxdepth=0, hidden=True), ['.dot.txt', '1.txt', '2.jpg'])
+            self.assertEqual(len(names(hidden=True)), 7)
+            cancel = threading.Event()
+            cancel.set()
+            self.assertEqual(names(cancel=cancel), [])
+
+            self.testdata.log(unit, 'Adding the files walked, skipping the ones already added')
+            files = jabr.main.Files()
+            files.add([os.path.join(tempdir, '1.txt')])
+            self.assertEqual(files.add_entries(walk.walk(tempdir), batchsize=2), 4)
+            self.assertEqual([f['fullpath'] for f in files.list], [entry[2] for entry in walk.walk(tempdir)])
+            self.assertEqual(files.add_iter([os.path.join(tempdir, 'a', '3.txt')]), 0)
+            self.assertEqual(files.add_entries(walk.walk(tempdir), cancel=cancel), 0)
+        finally:
+            shutil.rmtree(tempdir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    @unittest.skipIf(not hasattr(os, 'symlink') or os.name == 'nt', 'Symbolic links need privileges on Windows')
+    def test_jabr_identity_dedupe(self):
+        unit = 'JABR Identity Dedupe'
+        tempdir = tempfile.mkdtemp()
+        try:
+            target = os.path.join(tempdir, 'file.txt')
+            open(target, 'w').close()
+            os.symlink(target, os.path.join(tempdir, 'symlink.txt'))
+            os.link(target, os.path.join(tempdir, 'hardlink.txt'))
+            open(os.path.join(tempdir, 'other.txt'), 'w').close()
+
+            self.testdata.log(unit, 'Adding one file through a symlink, a hardlink & a relative path')
+            files = jabr.main.Files()
+            files.add([os.path.relpath(target), os.path.join(tempdir, 'symlink.txt'), os.path.join(tempdir, 'hardlink.txt')])
+            self.assertEqual([f['fullname'] for f in files.list], ['file.txt'])
+            files.add_entries(walk.walk(tempdir))
+            self.assertEqual([f['fullname'] for f in files.list], ['file.txt', 'other.txt'])
+            # Every path once per add, no stat being kept after
+            self.assertEqual(files.stats.calls, 7)
+            self.assertEqual(len(files.stats), 0)
+
+            self.testdata.log(unit, 'Keeping the identities across renames & freeing them on removal')
+            self.assertEqual(files.rename(['renamed.txt', ''])['errormsg'], '')
+            self.assertEqual(files.stats.calls, 7)
+            files.add([os.path.join(tempdir, 'hardlink.txt'), os.path.join(tempdir, 'other.txt')])
+            self.assertEqual(len(files.list), 2)
+            self.assertEqual(files.stats.calls, 9)
+            files.remove([0])
+            self.assertEqual(files.stats.calls, 9)
+            self.assertEqual(files.add([os.path.join(tempdir, 'hardlink.txt')]), (os.path.join(tempdir, 'hardlink.txt'),))
+            self.assertEqual(files.stats.calls, 10)
+        finally:
+            shutil.rmtree(tempdir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_sorted_numbering(self):
+        unit = 'JABR Sorted Numbering'
+        tempdir = tempfile.mkdtemp()
+        try:
+            # name: (size, mtime)
+            sizes = { 'img10.jpg': (3, 100), 'IMG9.jpg': (1, 300), 'img1.jpg': (2, 200) }
+            paths = []
+            for name, (size, mtime) in sizes.items():
+                paths.append(os.path.join(tempdir, name))
+                with open(paths[-1], 'w') as f:
+                    f.write('x' * size)
+                os.utime(paths[-1], (mtime, mtime))
+            files = jabr.main.Files()
+            files.add(paths)
+            stage = Stage(self.testdata.jabr.mods['Numbering']['object'], { 'format': 4, 'text': '_' })
+
+            self.testdata.log(unit, 'Numbering in list order, by natural name, size & modification time')
+            calls = files.stats.calls
+            for sort, expected in ((0, ['1_', '2_', '3_']), (1, ['3_', '2_', '1_']), (5, ['3_', '1_', '2_']), (3, ['1_', '3_', '2_'])):
+                stage.config['sort'] = sort
+                stage.prepare(files.list, files.sortkeys, files.version)
+                self.assertEqual(list(iter_newnames(files.list, stage.update_filenames, 'base', stage.POSITIONAL, chunksize=2)), [n + '.jpg' for n in expected])
+            self.assertLess(natural_key('IMG9.jpg'), natural_key('img10.jpg'))
+            # Sorted by the stats kept from adding the files
+            self.assertEqual(files.stats.calls, calls)
+
+            self.testdata.log(unit, 'Reusing the ranks until the files change')
+            self.assertIs(files.sortkeys.get_ranks(files.list, 'mtime', files.version), stage.filedata)
+            files.rename(['b', 'a', 'c'])
+            stage.config['sort'] = 1
+            stage.prepare(files.list, files.sortkeys, files.version)
+            self.assertEqual(stage.update_filenames([f['base'] for f in files.list]), ['2_', '1_', '3_'])
+            stage.config['sort'] = 5
+            stage.prepare(files.list, files.sortkeys, files.version)
+            self.assertEqual(stage.update_filenames([f['base'] for f in files.list]), ['3_', '1_', '2_'])
+            self.assertEqual(files.stats.calls, calls)
+
+            self.testdata.log(unit, 'Only offering creation dates where files have them')
+            sort_options = self.testdata.jabr.mods['Numbering']['object'].OPTIONS['sort']
+            self.assertEqual('Date Created' in sort_options, HAS_BIRTHTIME)
+            self.assertEqual('Date Changed' in sort_options, not HAS_BIRTHTIME)
+            self.assertEqual(list(sort_options.values()), list(range(len(sort_options))))
+            # A config saved where files have creation times sorts by the last change here
+            stage.config['sort'] = 4
+            self.assertTrue(stage.mod.validate_config(stage.config))
+            stage.prepare(files.list, files.sortkeys, files.version)
+            self.assertEqual(sorted(stage.update_filenames(['a', 'b', 'c'])), ['1_', '2_', '3_'])
+
+            self.testdata.log(unit, 'Passing the ranks to worker processes')
+            names = ['file {0}'.format(i) for i in range(1000, 0, -1)]
+            records = [{ 'fullname': n, 'dirpath': tempdir, 'fullpath': os.path.join(tempdir, n) } for n in names]
+            stage.config['sort'] = 1
+            stage.prepare(records, files.sortkeys)
+            expected = stage.update_filenames(names)
+            self.assertEqual(expected[:3], ['1000_', '999_', '998_'])
+            with ParallelTransformer(workers=2, chunksize=64, min_items=0, min_seconds=0, sample=10) as transformer:
+                self.assertEqual(transformer.update_filenames(stage, names), expected)
+                self.assertEqual(transformer.last_mode, 'parallel')
+        finally:
+            shutil.rmtree(tempdir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_content_hash(self):
+        unit = 'JABR Content Hash'
+        tempdir = tempfile.mkdtemp()
+        content_hash = self.testdata.jabr.mods['Content Hash']['object']
+        try:
+            dbpath = os.path.join(tempdir, 'cache', digests.FILENAME)
+            content_hash.cache = digests.DigestCache(dbpath)
+            paths = [os.path.join(tempdir, name) for name in ('a.txt', 'b.txt', 'c.txt')]
+            for p, content in zip(paths, (b'hello', b'hello', b'world' * 100000)):
+                with open(p, 'wb') as f:
+                    f.write(content)
+            sha256 = [hashlib.sha256(b'hello').hexdigest()] * 2 + [hashlib.sha256(b'world' * 100000).hexdigest()]
+
+            self.testdata.log(unit, 'Naming files by the hash of their content')
+            files = jabr.main.Files()
+            files.add(paths)
+            stage = Stage(content_hash, { 'format': 1, 'text': '_', 'length': 8 })
+            stage.prepare(files.list, files.sortkeys, files.version)
+            self.assertEqual(compute_newnames(files.list, stage.update_filenames, 'base'), ['{0}_{1}.txt'.format(n, h[:8]) for n, h in zip('abc', sha256)])
+            stage.config.update({ 'format': 0, 'length': 128, 'algorithm': 'blake2b' })
+            stage.prepare(files.list, files.sortkeys, files.version)
+            self.assertEqual(stage.update_filenames(['a', 'b', 'c'])[2], hashlib.blake2b(b'world' * 100000).hexdigest())
+            self.assertEqual(content_hash.cache.hashed, 6)
+
+            self.testdata.log(unit, 'Hashing the same content once across previews & sessions')
+            stage.prepare(files.list, files.sortkeys, files.version)
+            self.assertEqual(content_hash.cache.hashed, 6)
+            cache = digests.DigestCache(dbpath)
+            os.link(paths[0], os.path.join(tempdir, 'd.txt'))
+            self.assertEqual(cache.get(paths + [os.path.join(tempdir, 'd.txt'), 'missing.txt'], 'sha256'), sha256 + sha256[:1] + [None])
+            self.assertEqual(cache.hashed, 0)
+
+            self.testdata.log(unit, 'Hashing a loaded file again once it is written to')
+            with open(paths[1], 'ab') as f:
+                f.write(b'!')
+            stage.config.update({ 'algorithm': 'sha256', 'length': 64 })
+            stage.prepare(files.list, files.sortkeys, files.version)
+            self.assertEqual(stage.update_filenames(['a', 'b', 'c']), [sha256[0], hashlib.sha256(b'hello!').hexdigest(), sha256[2]])
+            self.assertEqual(content_hash.cache.hashed, 7)
+        finally:
+            content_hash.cache = None
+            shutil.rmtree(tempdir)
         self.testdata.log(unit, 'TESTING COMPLETE!')
 
     def test_jabr_remove(self):
@@ -91,6 +358,21 @@ class JAR_Test(unittest.TestCase):
         self.assertFalse(failed_remove)
         self.testdata.log(unit, 'TESTING COMPLETE!')
 
+    def test_jabr_remove_where(self):
+        unit = 'JABR Remove Where'
+        self.testdata.log(unit, 'Removing files by predicate and by mask')
+        files = self.testdata.jabr.files
+        files.clear()
+        files.add([os.path.abspath(os.path.join(self.testdata.dir, f)) for f in sorted(os.listdir(self.testdata.dir))])
+        removed_files = files.remove_where(lambda f: f['ext'] == 'bak')
+        self.assertEqual([os.path.basename(f) for f in removed_files], ['0001.bak', '0002.bak'])
+        self.assertFalse([f for f in files.list if f['ext'] == 'bak'])
+        count = len(files.list)
+        removed_files = files.remove_mask([i % 2 == 0 for i in range(count)])
+        self.assertEqual(len(files.list), count // 2)
+        self.assertEqual(files.add(removed_files), removed_files)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
     def test_jabr_clear(self):
         unit = 'JABR Clear'
         self.testdata.log(unit, 'Clearing files on JABR')
@@ -120,6 +402,86 @@ class JAR_Test(unittest.TestCase):
         self.assertFalse(mod in list(self.testdata.jabr.mods.keys()))
         self.testdata.log(unit, 'TESTING COMPLETE!')
 
+    def test_jabr_module_api(self):
+        unit = 'JABR Module API'
+        self.testdata.log(unit, 'Running the modules as pure functions of their config')
+        names = ['New Text Document', 'image 01', 'a']
+        for label, entry in self.testdata.jabr.mods.items():
+            mod = entry['object']
+            self.assertEqual(modapi.get_api_version(mod), modapi.API_VERSION)
+            config = pickle.loads(pickle.dumps(mod.get_config()))
+            before = copy.deepcopy(mod.module.config)
+            self.assertEqual(Stage(mod, config).update_filenames(names), Stage(mod, config).update_filenames(names))
+            self.assertEqual(mod.module.config, before)
+        numbering = self.testdata.jabr.mods['Numbering']['object']
+        config = dict(numbering.get_config(), start=0)
+        self.assertFalse(numbering.validate_config(config))
+        self.assertEqual(numbering.update_filenames(names, config), names)
+
+        self.testdata.log(unit, 'Loading a module written before API version 2')
+        dir = tempfile.mkdtemp()
+        with open(os.path.join(dir, 'jabr_legacy_test.py'), 'w') as fh:
+            fh.write('\n'.join([
+                'LABEL = \'Legacy\'',
+                'class Module:',
+                '    def __init__(self):',
+                '        self.config = { \'suffix\': \'\' }',
+                '    def update_filenames(self, files):',
+                '        return [f + self.config[\'suffix\'] for f in files]',
+                'module = Module()',
+                'def get_options():',
+                '    return {}',
+                'def update_filenames(files):',
+                '    return module.update_filenames(files)',
+                ''
+            ]))
+        self.testdata.jabr._load_mods(dir)
+        legacy = self.testdata.jabr.mods['Legacy']['object']
+        self.assertIsInstance(legacy, modapi.LegacyModule)
+        self.assertEqual(legacy.update_filenames(names, { 'suffix': '_1' }), [n + '_1' for n in names])
+        self.assertEqual(legacy.module.config, { 'suffix': '' })
+        self.assertEqual(legacy.get_config(), { 'suffix': '' })
+        sys.path.remove(dir)
+        shutil.rmtree(dir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_manifest(self):
+        unit = 'JABR Manifest'
+        dir = tempfile.mkdtemp()
+        sys.path.append(dir)
+        modpath = os.path.join(dir, 'jabr_manifest_test.py')
+        def write_module(label):
+            with open(modpath, 'w') as fh:
+                fh.write('LABEL = {0!r}\ndef get_options():\n    return {{}}\ndef update_filenames(files):\n    return files\n'.format(label))
+        try:
+            write_module('Before')
+            open(os.path.join(dir, 'notamodule.py'), 'w').close()
+            self.testdata.log(unit, 'Building the manifest on the first load')
+            mods = manifest.load(dir)
+            self.assertEqual(list(mods), ['Before'])
+            self.assertTrue(mods['Before'].loaded)
+            self.assertEqual(manifest.read(dir)['notamodule.py']['label'], None)
+
+            self.testdata.log(unit, 'Importing modules only when used on later loads')
+            del sys.modules['jabr_manifest_test'], sys.modules['notamodule']
+            mods = manifest.load(dir)
+            self.assertFalse(mods['Before'].loaded)
+            self.assertNotIn('jabr_manifest_test', sys.modules)
+            self.assertEqual(mods['Before']['object'].update_filenames(['a'], {}), ['a'])
+            self.assertIn('jabr_manifest_test', sys.modules)
+
+            self.testdata.log(unit, 'Reading a module again once it changes')
+            del sys.modules['jabr_manifest_test']
+            write_module('After Changing')
+            self.assertEqual(list(manifest.load(dir)), ['After Changing'])
+            os.remove(modpath)
+            self.assertEqual(manifest.load(dir), {})
+        finally:
+            sys.modules.pop('jabr_manifest_test', None)
+            sys.path.remove(dir)
+            shutil.rmtree(dir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
     def test_jabr_add_performance(self):
         unit = 'JABR Add Performance'
         dir = 'jabr_performance'
@@ -139,6 +501,731 @@ class JAR_Test(unittest.TestCase):
         self.testdata.log(unit, 'Operating time in seconds: {0}'.format(end - start))
         shutil.rmtree(dir)
         self.testdata.log(unit, 'TESTING COMPLETE!')
-        
+
+    def test_jabr_cli(self):
+        unit = 'JABR CLI'
+        env = dict(os.environ, PYTHONPATH=jabr_path)
+        command = [sys.executable, '-m', 'jabr', 'numbering', '-0', '-o', 'format=Number Text', '-o', 'leading_zeros=1']
+        tempdir = tempfile.mkdtemp()
+        try:
+            paths = [os.path.join(tempdir, n) for n in ('a b.txt', 'c.txt')]
+            for p in paths:
+                open(p, 'w').close()
+            stdin = b'\0'.join(os.fsencode(p) for p in paths)
+
+            self.testdata.log(unit, 'Printing the plan for paths read from stdin')
+            result = subprocess.run(command, input=stdin, stdout=subprocess.PIPE, env=env, check=True)
+            expected = [os.path.join(tempdir, n) for n in ('01.txt', '02.txt')]
+            self.assertEqual(result.stdout.split(b'\0')[:-1], [os.fsencode(p) for pair in zip(paths, expected) for p in pair])
+            self.assertEqual(sorted(os.listdir(tempdir)), ['a b.txt', 'c.txt'])
+
+            self.testdata.log(unit, 'Renaming the files')
+            subprocess.run(command + ['--execute'], input=stdin, env=env, check=True)
+            self.assertEqual(sorted(os.listdir(tempdir)), ['01.txt', '02.txt'])
+            result = subprocess.run(command + ['-o', 'format=9'], input=stdin, stderr=subprocess.PIPE, env=env)
+            self.assertEqual(result.returncode, 2)
+
+            self.testdata.log(unit, 'Checking that Tk is not imported')
+            script = 'import sys; from jabr import cli; cli.main(["--list"]); print("tkinter" in sys.modules)'
+            result = subprocess.run([sys.executable, '-c', script], stdout=subprocess.PIPE, env=env, check=True)
+            self.assertEqual(result.stdout.splitlines()[-1], b'False')
+        finally:
+            shutil.rmtree(tempdir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_dirindex(self):
+        unit = 'JABR DirIndex'
+        dir = tempfile.mkdtemp()
+        open(os.path.join(dir, 'a.txt'), 'a').close()
+        dirindex = DirIndex()
+        self.testdata.log(unit, 'Checking candidate names against the index')
+        self.assertEqual(dirindex.conflicts(dir, ['a.txt', 'b.txt']), ['a.txt'])
+        self.assertIs(dirindex.names(dir), dirindex.names(dir))
+        self.testdata.log(unit, 'Checking that a changed directory is rescanned')
+        open(os.path.join(dir, 'b.txt'), 'a').close()
+        os.utime(dir, ns=(0, 0))
+        self.assertEqual(dirindex.conflicts(dir, ['a.txt', 'b.txt']), ['a.txt', 'b.txt'])
+        shutil.rmtree(dir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_rename_conflict(self):
+        unit = 'JABR Rename Conflict'
+        for noreplace in {False, fsops.has_noreplace()}:
+            self.testdata.log(unit, 'Renaming a file onto an existing name (noreplace: {0})'.format(noreplace))
+            dir = tempfile.mkdtemp()
+            files = [os.path.join(dir, f) for f in ('a.txt', 'b.txt')]
+            for f in files:
+                open(f, 'a').close()
+            self.testdata.jabr.files.clear()
+            self.testdata.jabr.files.noreplace = noreplace
+            self.testdata.jabr.files.add(files[:1])
+            result = self.testdata.jabr.files.rename(['b.txt'])
+            self.assertTrue(result['errormsg'])
+            self.assertIn('b.txt', result['errorlog'])
+            self.assertEqual(result['newoldnames'], ('a.txt',))
+            self.assertEqual(sorted(os.listdir(dir)), ['a.txt', 'b.txt'])
+            shutil.rmtree(dir)
+        self.testdata.log(unit, 'Renaming with fewer new names than files')
+        dir = tempfile.mkdtemp()
+        files = [os.path.join(dir, f) for f in ('a.txt', 'b.txt')]
+        for f in files:
+            open(f, 'a').close()
+        self.testdata.jabr.files.clear()
+        self.testdata.jabr.files.add(files)
+        result = self.testdata.jabr.files.rename(['c.txt'])
+        self.assertTrue(result['errormsg'])
+        self.assertEqual(result['newoldnames'], ('a.txt', 'b.txt'))
+        self.assertEqual(sorted(os.listdir(dir)), ['a.txt', 'b.txt'])
+        shutil.rmtree(dir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_rename_chains(self):
+        unit = 'JABR Rename Chains'
+        modes = [(n, d) for n in {False, fsops.has_noreplace()} for d in {False, fsops.has_dirfd()}]
+        for noreplace, dirfd in modes:
+            self.testdata.log(unit, 'Renaming files onto names held by the same batch (noreplace: {0}, dirfd: {1})'.format(noreplace, dirfd))
+            dir = tempfile.mkdtemp()
+            files = [os.path.join(dir, '{0:03d}'.format(i)) for i in range(1, 6)]
+            for f in files:
+                with open(f, 'w') as fh:
+                    fh.write(os.path.basename(f))
+            self.testdata.jabr.files.clear()
+            self.testdata.jabr.files.noreplace = noreplace
+            self.testdata.jabr.files.dirfd = dirfd
+            self.testdata.jabr.files.add(files)
+            # Shift 001..004 up by one and swap 005 with 001
+            new_filenames = ['002', '003', '004', '005', '001']
+            result = self.testdata.jabr.files.rename(new_filenames)
+            self.assertFalse(result['errormsg'])
+            self.assertEqual(result['newoldnames'], tuple(new_filenames))
+            self.assertEqual(sorted(os.listdir(dir)), ['001', '002', '003', '004', '005'])
+            for old, new in zip(files, new_filenames):
+                with open(os.path.join(dir, new)) as fh:
+                    self.assertEqual(fh.read(), os.path.basename(old))
+            self.testdata.log(unit, 'Rename stats: {0}'.format(result['stats']))
+            self.assertEqual(result['stats']['saved_lookups'] > 0, dirfd)
+            shutil.rmtree(dir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_threaded_rename(self):
+        unit = 'JABR Threaded Rename'
+        latency = 0.02
+        times = {}
+        for workers in (1, 8):
+            dir = tempfile.mkdtemp()
+            self.testdata.log(unit, 'Renaming files with {0} workers and {1}s latency'.format(workers, latency))
+            sources = [os.path.join(dir, '{0}_{1:03d}'.format(workers, i)) for i in range(1, 41)]
+            for f in sources:
+                open(f, 'a').close()
+            # A shifted chain and a swap next to independent renames
+            targets = sources[1:4] + [sources[0] + '.last'] + [sources[5], sources[4]]
+            targets += [f + '.new' for f in sources[6:]]
+            plan = planner.plan(sources, targets)
+            if workers > 1:
+                runner = executor.ThreadedExecutor(Latency_FileSystem(latency), workers=workers)
+            else:
+                runner = executor.Executor(Latency_FileSystem(latency))
+            start = timeit.default_timer()
+            errors, parked = runner.run(plan)
+            times[workers] = timeit.default_timer() - start
+            self.testdata.log(unit, 'Operating time in seconds: {0}'.format(times[workers]))
+            self.assertFalse(errors)
+            self.assertFalse(parked)
+            self.assertEqual(set(os.listdir(dir)), {os.path.basename(f) for f in sources[1:6] + targets[3:4] + targets[6:]})
+            self.assertEqual(runner.stats['syscalls'], len(plan))
+            shutil.rmtree(dir)
+        self.assertLess(times[8], times[1] / 2)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_duplicate_index(self):
+        unit = 'JABR Duplicate Index'
+        self.testdata.log(unit, 'Updating new names row by row')
+        duplicates = DuplicateIndex(4)
+        self.assertFalse(duplicates.is_valid())
+        self.assertEqual(duplicates.update([(0, 'a'), (1, 'b'), (2, 'c')]), set())
+        self.assertTrue(duplicates.is_valid())
+        self.assertEqual(duplicates.update([(2, 'a')]), {0})
+        self.assertTrue(duplicates.is_duplicate(0) and duplicates.is_duplicate(2))
+        self.assertEqual(duplicates.update([(3, 'a')]), set())
+        self.assertEqual(duplicates.duplicates, 3)
+        self.assertFalse(duplicates.is_valid())
+        self.assertEqual(duplicates.update([(0, ''), (2, 'c')]), {3})
+        self.assertFalse(duplicates.is_duplicate(3))
+        self.assertEqual((duplicates.duplicates, duplicates.blanks), (0, 1))
+        self.assertTrue(duplicates.is_valid())
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_preview_cache(self):
+        unit = 'JABR Preview Cache'
+        self.testdata.log(unit, 'Keying previews by module config, file part & version')
+        cache = PreviewCache()
+        replace = self.testdata.jabr.mods['Replace']['object']
+        mod = Stage(replace)
+        key = cache.get_key(mod, 'base', self.testdata.jabr.files.version)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, ['a', 'b'])
+        self.assertEqual(cache.get(key), ('a', 'b'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertNotEqual(cache.get_key(mod, 'ext', self.testdata.jabr.files.version), key)
+        config = dict(replace.get_config(), find='a')
+        self.assertNotEqual(cache.get_key(Stage(replace, config), 'base', self.testdata.jabr.files.version), key)
+        self.testdata.jabr.files.remove([0])
+        self.assertIsNone(cache.get(cache.get_key(mod, 'base', self.testdata.jabr.files.version)))
+        self.testdata.log(unit, 'Never caching previews of modules that read the files')
+        content_hash = Stage(self.testdata.jabr.mods['Content Hash']['object'])
+        self.assertIsNone(cache.get_key(content_hash, 'base', self.testdata.jabr.files.version))
+        self.assertIsNone(cache.get_key(Pipeline([mod, content_hash]), 'base', self.testdata.jabr.files.version))
+        self.testdata.log(unit, 'Evicting the least recently used previews')
+        cache = PreviewCache(maxsize=2000)
+        for i in range(4):
+            cache.put(i, ['name{0}'.format(n) for n in range(10)])
+        self.assertLessEqual(cache.size, cache.maxsize)
+        self.assertIsNone(cache.get(0))
+        self.assertIsNotNone(cache.get(3))
+        cache.put('big', ['name'] * 1000)
+        self.assertIsNone(cache.get('big'))
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_incremental_preview(self):
+        unit = 'JABR Incremental Preview'
+        files = self.testdata.jabr.files
+        for label in ('Numbering', 'Letter Case'):
+            mod = Stage(self.testdata.jabr.mods[label]['object'])
+            self.testdata.log(unit, 'Updating the {0} preview after an add & a remove'.format(label))
+            version = files.version
+            newnames = compute_newnames(files.list, mod.update_filenames, 'base')
+            files.add(['sample/{0}-{1}.txt'.format(label, i) for i in range(3)])
+            files.remove([1, 2])
+            newnames, start = update_newnames(files.list, mod, 'base', newnames, files.get_changes(version))
+            self.assertEqual(start, 1)
+            self.assertEqual(newnames, compute_newnames(files.list, mod.update_filenames, 'base'))
+
+        self.testdata.log(unit, 'Computing only the added rows of a position independent module')
+        mod = Upper_Module()
+        version = files.version
+        newnames = compute_newnames(files.list, mod.update_filenames, 'fullname')
+        del mod.computed[:]
+        files.remove([0])
+        files.add(['sample/added-1.txt', 'sample/added-2.txt'])
+        newnames, start = update_newnames(files.list, mod, 'fullname', newnames, files.get_changes(version))
+        self.assertEqual(mod.computed, ['added-1.txt', 'added-2.txt'])
+        self.assertEqual(newnames, [f['fullname'].upper() for f in files.list])
+        files.clear()
+        self.assertIsNone(files.get_changes(version))
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_pipeline(self):
+        unit = 'JABR Pipeline'
+        mods = self.testdata.jabr.mods
+        files = self.testdata.jabr.files
+        stages = (
+            ('Replace', { 'find': 'a', 'replacer': 'b' }),
+            ('Letter Case', { 'case': 2 }),
+            ('Numbering', { 'leading zeros': 2, 'start': 1, 'format': 0, 'text': '-' })
+        )
+        self.testdata.log(unit, 'Stacking {0}'.format(' -> '.join(label for label, _ in stages)))
+        pipeline = Pipeline(chunksize=3)
+        for label, config in stages:
+            pipeline.add(mods[label]['object'], config)
+        self.assertEqual(mods['Replace']['object'].module.config['find'], '')
+        self.assertTrue(pipeline.POSITIONAL)
+
+        names = ['banana', 'cat', 'apple', 'dog', 'pear', 'fig', 'kiwi']
+        expected = [n.replace('a', 'b').upper() for n in names]
+        expected = ['{0}-{1:03d}'.format(n, i + 1) for i, n in enumerate(expected)]
+        self.assertEqual(pipeline.update_filenames(names), expected)
+        self.assertEqual([label for label, _ in pipeline.get_timings()], [label for label, _ in stages])
+
+        self.testdata.log(unit, 'Renaming the files in one pass')
+        dir = tempfile.mkdtemp()
+        for n in names:
+            with open(os.path.join(dir, n + '.txt'), 'w') as fh:
+                fh.write(n)
+        files.clear()
+        files.add([os.path.join(dir, n + '.txt') for n in names])
+        newnames = compute_newnames(files.list, pipeline.update_filenames, 'base')
+        result = files.rename(newnames)
+        self.assertFalse(result['errormsg'])
+        self.assertEqual(sorted(os.listdir(dir)), sorted(n + '.txt' for n in expected))
+        self.testdata.log(unit, 'Stage timings: {0}'.format(pipeline.get_timings()))
+        shutil.rmtree(dir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_parallel_transform(self):
+        unit = 'JABR Parallel Transform'
+        mods = self.testdata.jabr.mods
+        pipeline = Pipeline([
+            Stage(mods['Replace']['object'], { 'find': r'(\d+)', 'replacer': r'<\1>', 'regex': 1 }),
+            Stage(mods['Numbering']['object'], { 'text': '_' })
+        ])
+        names = ['file {0}'.format(i) for i in range(1000)]
+        expected = pipeline.update_filenames(names)
+        self.testdata.log(unit, 'Stitching chunks transformed by worker processes back in order')
+        with ParallelTransformer(workers=2, chunksize=64, min_items=0, min_seconds=0, sample=10) as transformer:
+            self.assertEqual(transformer.update_filenames(pipeline, names), expected)
+            self.assertEqual(transformer.last_mode, 'parallel')
+            self.testdata.log(unit, 'Adding up the stage timings of the worker processes')
+            pipeline.timings = [0.0] * len(pipeline)
+            transformer.sample = 0
+            self.assertEqual(transformer.update_filenames(pipeline, names), expected)
+            self.assertTrue(all(seconds > 0 for _, seconds in pipeline.get_timings()))
+            transformer.sample = 10
+            self.testdata.log(unit, 'Transforming small lists & unimportable modules serially')
+            transformer.min_items = 5000
+            self.assertEqual(transformer.update_filenames(pipeline, names), expected)
+            self.assertEqual(transformer.last_mode, 'serial')
+            transformer.min_items = 0
+            self.assertEqual(transformer.update_filenames(Upper_Module(), names), [n.upper() for n in names])
+            self.assertEqual(transformer.last_mode, 'serial')
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_replace(self):
+        unit = 'JABR Replace'
+        replace = self.testdata.jabr.mods['Replace']['object']
+        self.testdata.log(unit, 'Validating patterns & templates up front')
+        config = dict(replace.get_config(), regex=1)
+        self.assertEqual(replace.get_errors(dict(config, find='(')), { 'find' })
+        self.assertEqual(replace.get_errors(dict(config, find='(a)', replacer=r'\2')), { 'replacer' })
+        self.assertEqual(replace.get_errors(dict(config, find='(?P<x>a)', replacer=r'\g<x>')), set())
+        self.assertEqual(replace.update_filenames(['a'], dict(config, find='(a)', replacer=r'\2')), ['a'])
+
+        self.testdata.log(unit, 'Comparing batched & per name results')
+        names = ['', 'ab', 'a1b22', 'foo bar', 'x.tar.gz', '_-_']
+        for find in (r'x*', r'\b\w', r'\d+', r'(a|1)+', r'^a', r'\W', r'\B'):
+            for replacer in ('', r'<\g<0>>'):
+                expected = [re.sub(find, replacer, n) for n in names]
+                self.assertEqual(replace.update_filenames(names, dict(config, find=find, replacer=replacer)), expected)
+        self.assertTrue(replace.compile_config(r'(\w+) (\d+)', '')[1])
+        self.assertFalse(replace.compile_config(r'a$', '')[1])
+        self.assertFalse(replace.compile_config(r'a', '\n')[1])
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    @unittest.skipIf(not vectorized.is_available(), 'NumPy 2 is not installed')
+    def test_jabr_vectorized(self):
+        unit = 'JABR Vectorized'
+        mods = self.testdata.jabr.mods
+        names = ['', 'a', 'ab', 'file.txt', 'straße 1', 'ǆemal', 'ﬁle', 'x' * 20]
+        configs = [(mods['Letter Case'], { 'case': c }) for c in range(3)]
+        for f in range(2):
+            configs.extend((mods['Insert'], { 'insert': '-', 'position': p, 'from': f }) for p in (0, 1, 2, 8, 30))
+            configs.extend((mods['Remove Characters'], { 'start': s, 'end': e, 'from': f }) for s, e in ((0, 1), (1, 2), (2, 5), (0, 30), (7, 30)))
+        configs.extend((mods['Numbering'], { 'leading zeros': 2, 'start': 9, 'format': f, 'text': '_' }) for f in range(5))
+
+        self.testdata.log(unit, 'Comparing the NumPy & Python backends of the built-in modules')
+        min_items = vectorized.MIN_ITEMS
+        try:
+            for entry, config in configs:
+                stage = Stage(entry['object'], config)
+                vectorized.MIN_ITEMS = {}
+                expected = stage.update_filenames(names, 3)
+                vectorized.MIN_ITEMS = dict.fromkeys(('case', 'insert', 'remove', 'number'), 0)
+                self.assertEqual(stage.update_filenames(names, 3), expected, msg=(stage.LABEL, config))
+        finally:
+            vectorized.MIN_ITEMS = min_items
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_regex_guard(self):
+        unit = 'JABR Regex Guard'
+        replace = self.testdata.jabr.mods['Replace']['object']
+        self.testdata.log(unit, 'Telling patterns that may backtrack catastrophically')
+        for find, risky in ((r'(a+)+$', True), (r'(a|aa)*b', True), (r'(x)\1', True), (r'(\w+) (\d+)', False), (r'[ab]*c', False)):
+            self.assertEqual(replace.compile_config(find, '')[2], risky)
+
+        self.testdata.log(unit, 'Aborting a pattern that goes over its time budget')
+        guard = regexguard.GuardedRegex(budget=0.5)
+        names = ['a' * 40 + 'b', 'aaa']
+        started = time.perf_counter()
+        with self.assertRaises(regexguard.PatternTimeout):
+            guard.sub(r'(a+)+$', 'x', names)
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertIn(r'(a+)+$', guard.flagged)
+        with self.assertRaises(regexguard.PatternTimeout):
+            guard.sub(r'(a+)+$', 'x', ['aaa'])
+        self.assertEqual(guard.sub(r'(a+)+', 'x', ['aaa', 'bab']), ['x', 'bxb'])
+
+        self.testdata.log(unit, 'Restarting a worker that died between patterns')
+        guard._process.kill()
+        guard._process.join()
+        self.assertEqual(guard.sub(r'(b+)+', 'x', ['bab']), ['xax'])
+        self.assertNotIn(r'(b+)+', guard.flagged)
+
+        self.testdata.log(unit, 'Flagging a pattern the worker dies running')
+        guard.budget = 30
+        killer = threading.Timer(0.5, guard._process.kill)
+        killer.start()
+        started = time.perf_counter()
+        with self.assertRaises(regexguard.PatternTimeout):
+            guard.sub(r'(a|aa)+$', 'x', ['a' * 60 + 'b'])
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertIn(r'(a|aa)+$', guard.flagged)
+        self.assertEqual(guard.sub(r'(a+)+', 'x', ['bab']), ['bxb'])
+        guard.close()
+
+        self.testdata.log(unit, 'Flagging the pattern rather than each file in Replace')
+        guard = replace.get_guard()
+        budget = guard.budget
+        flagged = set(guard.flagged)
+        guard.budget = 0.5
+        try:
+            config = { 'find': r'(a+)+$', 'replacer': 'x', 'regex': 1 }
+            self.assertEqual(replace.update_filenames(names, config), names)
+            self.assertEqual(replace.get_errors(config), { 'find' })
+            self.assertEqual(replace.update_filenames(names, dict(config, find=r'(a+)+b')), ['x', 'aaa'])
+        finally:
+            guard.budget = budget
+            guard.flagged = flagged
+            guard.close()
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_preview_scheduler(self):
+        unit = 'JABR Preview Scheduler'
+        self.testdata.log(unit, 'Changing the config while a preview is computing')
+        eventloop = After_Queue()
+        config = {}
+        computed = []
+        delivered = []
+        def compute(job):
+            time.sleep(0.02)
+            computed.append(job)
+            return job
+        scheduler = PreviewScheduler(eventloop, lambda: config['text'], compute, lambda r, e: delivered.append(r))
+        config['text'] = 'a'
+        scheduler.request()
+        eventloop.callbacks.pop(0)()
+        for text in ('ab', 'abc'):
+            config['text'] = text
+            scheduler.request()
+        eventloop.run()
+        self.assertEqual(computed, ['a', 'abc'])
+        self.assertEqual(delivered, ['abc'])
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_parallel_performance(self):
+        unit = 'JABR Parallel Performance'
+        mods = self.testdata.jabr.mods
+        stage = Stage(mods['Replace']['object'], { 'find': r'(\w+) (\d+)', 'replacer': r'\2 \1', 'regex': 1 })
+        workers = max(2, os.cpu_count() or 1)
+        self.testdata.log(unit, 'Timing a regex Replace serially & on {0} worker processes'.format(workers))
+        crossover = None
+        with ParallelTransformer(workers=workers, min_items=0, min_seconds=0) as transformer:
+            # Starts the pool so that its start up is not counted
+            transformer.update_filenames(stage, ['file 1'] * transformer.sample * 2)
+            for size in (10000, 50000, 200000):
+                names = ['file {0}'.format(i) for i in range(size)]
+                started = time.perf_counter()
+                expected = stage.update_filenames(names)
+                serial = time.perf_counter() - started
+                started = time.perf_counter()
+                newnames = transformer.update_filenames(stage, names)
+                parallel = time.perf_counter() - started
+                self.assertEqual(newnames, expected)
+                self.testdata.log(unit, '{0} names: {1:.3f}s serial, {2:.3f}s parallel'.format(size, serial, parallel))
+                if crossover is None and parallel < serial:
+                    crossover = size
+        self.testdata.log(unit, 'Parallel is faster from {0} names'.format(crossover) if crossover else 'Parallel is not faster up to 200000 names on this machine')
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_replace_performance(self):
+        unit = 'JABR Replace Performance'
+        replace = self.testdata.jabr.mods['Replace']['object']
+        config = { 'find': r'(\w+) (\d+)', 'replacer': r'\2 \1', 'regex': 1 }
+        names = ['file {0}'.format(i) for i in range(100000)]
+
+        def loop(files):
+            # update_filenames before patterns were compiled & validated once
+            newfilenames = []
+            for f in files:
+                try:
+                    newfilenames.append(re.sub(config['find'], config['replacer'], f))
+                except re.error:
+                    newfilenames.append(f)
+            return newfilenames
+
+        self.testdata.log(unit, 'Replacing with a regex in {0} names'.format(len(names)))
+        started = time.perf_counter()
+        expected = loop(names)
+        looped = time.perf_counter() - started
+        pattern = replace.compile_config(config['find'], config['replacer'])[0]
+        started = time.perf_counter()
+        compiled = [pattern.sub(config['replacer'], n) for n in names]
+        compiledtime = time.perf_counter() - started
+        started = time.perf_counter()
+        batched = replace.update_filenames(names, config)
+        batchedtime = time.perf_counter() - started
+        self.assertEqual(compiled, expected)
+        self.assertEqual(batched, expected)
+        self.testdata.log(unit, 'Loop: {0:.3f}s, compiled: {1:.3f}s, batched: {2:.3f}s'.format(looped, compiledtime, batchedtime))
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    @unittest.skipIf(not vectorized.is_available(), 'NumPy 2 is not installed')
+    def test_jabr_vectorized_performance(self):
+        unit = 'JABR Vectorized Performance'
+        mods = self.testdata.jabr.mods
+        stages = [
+            Stage(mods['Letter Case']['object'], { 'case': 0 }),
+            Stage(mods['Insert']['object'], { 'insert': '_new', 'position': 4, 'from': 1 }),
+            Stage(mods['Remove Characters']['object'], { 'start': 2, 'end': 6, 'from': 1 }),
+            Stage(mods['Numbering']['object'], { 'leading zeros': 6, 'start': 1, 'format': 1, 'text': ' - ' })
+        ]
+        min_items = vectorized.MIN_ITEMS
+        try:
+            for size in (10000, 100000, 1000000):
+                names = ['holiday photo {0}.jpg'.format(i) for i in range(size)]
+                for stage in stages:
+                    vectorized.MIN_ITEMS = {}
+                    started = time.perf_counter()
+                    expected = stage.update_filenames(names)
+                    python = time.perf_counter() - started
+                    vectorized.MIN_ITEMS = dict.fromkeys(('case', 'insert', 'remove', 'number'), 0)
+                    started = time.perf_counter()
+                    newnames = stage.update_filenames(names)
+                    numpy = time.perf_counter() - started
+                    self.assertEqual(newnames, expected)
+                    self.testdata.log(unit, '{0} {1} names: {2:.3f}s Python, {3:.3f}s NumPy'.format(stage.LABEL, size, python, numpy))
+        finally:
+            vectorized.MIN_ITEMS = min_items
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_cli_performance(self):
+        unit = 'JABR CLI Performance'
+        env = dict(os.environ, PYTHONPATH=jabr_path)
+        commands = [
+            ('CLI', [sys.executable, '-m', 'jabr', '--list']),
+            # What main.py does before opening the window, short of connecting to a display
+            ('GUI', [sys.executable, '-c', 'import multiprocessing, jabr.main, jabr.tkui; jabr.tkui.tkinter.Tcl(); jabr.main.JABR()'])
+        ]
+        self.testdata.log(unit, 'Timing the cold start of the CLI & GUI, best of 5')
+        for label, command in commands:
+            timings = []
+            for _ in range(5):
+                started = time.perf_counter()
+                subprocess.run(command, stdout=subprocess.DEVNULL, env=env, check=True)
+                timings.append(time.perf_counter() - started)
+            self.testdata.log(unit, '{0}: {1:.3f}s'.format(label, min(timings)))
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_streaming_performance(self):
+        unit = 'JABR Streaming Performance'
+        stage = Stage(self.testdata.jabr.mods['Numbering']['object'], { 'format': 1 })
+
+        def stream_plan(files):
+            with open(os.devnull, 'wb') as sink:
+                cli.write_plan(sink, files.list, iter_newnames(files.list, stage.update_filenames, 'base', True, 10000))
+
+        def list_plan(files):
+            with open(os.devnull, 'wb') as sink:
+                cli.write_plan(sink, files.list, compute_newnames(files.list, stage.update_filenames, 'base'))
+
+        overheads = []
+        for number_of_files in (25000, 100000):
+            paths = lambda: (os.path.join(os.sep, 'data', str(i % 100), 'file_{0}.txt'.format(i)) for i in range(number_of_files))
+            self.testdata.log(unit, 'Measuring the memory used on top of Files.list for {0} files'.format(number_of_files))
+            for label, add, plan in (('Streamed', lambda f: f.add_iter(paths()), stream_plan), ('Listed', lambda f: f.add(list(paths())), list_plan)):
+                filesobj = jabr.main.Files()
+                plan(filesobj) # Loads what the modules import on first use
+                tracemalloc.start()
+                add(filesobj)
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                plan(filesobj)
+                planpeak = tracemalloc.get_traced_memory()[1] - current
+                tracemalloc.stop()
+                self.testdata.log(unit, '{0}: {1} bytes adding, {2} bytes writing the plan'.format(label, peak - current, planpeak))
+                overheads.append((peak - current, planpeak))
+        # Only the batch & chunk in flight are held, so streaming 4 times
+        # the files takes less memory than listing them
+        self.assertLess(overheads[2][0], overheads[1][0])
+        self.assertLess(overheads[2][1], overheads[1][1])
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_walk_performance(self):
+        unit = 'JABR Walk Performance'
+        tempdir = tempfile.mkdtemp()
+        try:
+            number_of_dirs = 100
+            for d in range(number_of_dirs):
+                dirpath = os.path.join(tempdir, str(d // 10), str(d))
+                os.makedirs(dirpath)
+                for i in range(500):
+                    open(os.path.join(dirpath, 'file_{0}.txt'.format(i)), 'w').close()
+            self.testdata.log(unit, 'Loading a tree of {0} files'.format(number_of_dirs * 500))
+
+            started = time.perf_counter()
+            walked = jabr.main.Files()
+            walked.add_entries(walk.walk(tempdir))
+            walktime = time.perf_counter() - started
+
+            # What loading the tree took with os.walk & Files.add
+            started = time.perf_counter()
+            added = jabr.main.Files()
+            added.add([os.path.join(dp, f) for dp, _, fs in os.walk(tempdir) for f in sorted(fs)])
+            addtime = time.perf_counter() - started
+
+            self.assertEqual(sorted(f['fullpath'] for f in walked.list), sorted(f['fullpath'] for f in added.list))
+            self.testdata.log(unit, 'scandir & add_entries: {0:.3f}s, os.walk & add: {1:.3f}s, {2:.0f} files/s'.format(walktime, addtime, len(walked.list) / walktime))
+        finally:
+            shutil.rmtree(tempdir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_sort_performance(self):
+        unit = 'JABR Sort Performance'
+        tempdir = tempfile.mkdtemp()
+        try:
+            number_of_files = 20000
+            for i in range(number_of_files):
+                open(os.path.join(tempdir, 'file_{0}.txt'.format(i)), 'w').close()
+            files = jabr.main.Files()
+            files.add([os.path.join(tempdir, f) for f in os.listdir(tempdir)])
+            stage = Stage(self.testdata.jabr.mods['Numbering']['object'], { 'sort': 3 })
+            self.testdata.log(unit, 'Numbering {0} files by modification time'.format(number_of_files))
+
+            def refresh(sortkeys, version=None):
+                stage.prepare(files.list, sortkeys, version)
+                return compute_newnames(files.list, stage.update_filenames, 'base')
+
+            # What each preview took stat'ing & sorting the files itself
+            started = time.perf_counter()
+            ranks = [0] * len(files.list)
+            for rank, i in enumerate(sorted(range(len(files.list)), key=lambda i: os.stat(files.list[i]['fullpath']).st_mtime_ns)):
+                ranks[i] = rank
+            stage.filedata = ranks
+            expected = compute_newnames(files.list, stage.update_filenames, 'base')
+            stattime = time.perf_counter() - started
+
+            timings = []
+            for workers in (1, 8):
+                sortkeys = SortKeys(workers)
+                started = time.perf_counter()
+                self.assertEqual(refresh(sortkeys), expected)
+                timings.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            self.assertEqual(refresh(files.sortkeys, files.version), expected)
+            self.assertEqual(refresh(files.sortkeys, files.version), expected)
+            refreshtime = (time.perf_counter() - started) / 2
+            self.testdata.log(unit, 'stat & sort: {0:.3f}s, first preview: {1:.3f}s with 1 thread, {2:.3f}s with 8, refreshing: {3:.3f}s'.format(stattime, timings[0], timings[1], refreshtime))
+        finally:
+            shutil.rmtree(tempdir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_content_hash_performance(self):
+        unit = 'JABR Content Hash Performance'
+        tempdir = tempfile.mkdtemp()
+        try:
+            number_of_files = 32
+            size = 4 * 1024 * 1024
+            paths = []
+            for i in range(number_of_files):
+                paths.append(os.path.join(tempdir, 'file_{0}.bin'.format(i)))
+                with open(paths[-1], 'wb') as f:
+                    f.write(os.urandom(size))
+            megabytes = number_of_files * size / 1000000
+            self.testdata.log(unit, 'Hashing {0} files of {1} MB'.format(number_of_files, size // 1000000))
+
+            # What hashing the files took reading each one whole
+            started = time.perf_counter()
+            expected = []
+            for p in paths:
+                with open(p, 'rb') as f:
+                    expected.append(hashlib.sha256(f.read()).hexdigest())
+            readtime = time.perf_counter() - started
+
+            dbpath = os.path.join(tempdir, 'cache', digests.FILENAME)
+            timings = []
+            for workers in (1, 4):
+                if os.path.exists(dbpath):
+                    os.remove(dbpath)
+                started = time.perf_counter()
+                self.assertEqual(digests.DigestCache(dbpath).get(paths, 'sha256', workers), expected)
+                timings.append(time.perf_counter() - started)
+            cache = digests.DigestCache(dbpath)
+            started = time.perf_counter()
+            self.assertEqual(cache.get(paths, 'sha256'), expected)
+            cachedtime = time.perf_counter() - started
+            self.assertEqual(cache.hashed, 0)
+            self.testdata.log(unit, 'read & hash: {0:.0f} MB/s, 1 thread: {1:.0f} MB/s, 4 threads: {2:.0f} MB/s, cached: {3:.4f}s'.format(
+                megabytes / readtime, megabytes / timings[0], megabytes / timings[1], cachedtime))
+        finally:
+            shutil.rmtree(tempdir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_manifest_performance(self):
+        unit = 'JABR Manifest Performance'
+        number_of_mods = 200
+        dir = tempfile.mkdtemp()
+        sys.path.append(dir)
+        names = ['jabr_plugin_{0}'.format(i) for i in range(number_of_mods)]
+        try:
+            for name in names:
+                with open(os.path.join(dir, name + '.py'), 'w') as fh:
+                    fh.write('LABEL = {0!r}\ndef get_options():\n    return {{}}\ndef update_filenames(files):\n    return files\n'.format(name))
+            manifest.load(dir) # Compiles the modules
+
+            def load(keep_manifest):
+                for name in names:
+                    sys.modules.pop(name, None)
+                if not keep_manifest:
+                    os.remove(os.path.join(dir, manifest.FILENAME))
+                importlib.invalidate_caches()
+                started = time.perf_counter()
+                self.assertEqual(len(manifest.load(dir)), number_of_mods)
+                return time.perf_counter() - started
+
+            self.testdata.log(unit, 'Loading {0} modules with & without the manifest'.format(number_of_mods))
+            importing = min(load(False) for _ in range(3))
+            listing = min(load(True) for _ in range(3))
+            self.testdata.log(unit, 'Importing every module: {0:.4f}s, from the manifest: {1:.4f}s'.format(importing, listing))
+            self.assertLess(listing, importing)
+        finally:
+            for name in names:
+                sys.modules.pop(name, None)
+            sys.path.remove(dir)
+            shutil.rmtree(dir)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
+    def test_jabr_memory_performance(self):
+        unit = 'JABR Memory Performance'
+        number_of_files = 100000
+        # Real files, so that adding them stats each one
+        tempdir = tempfile.mkdtemp()
+        for d in range(100):
+            os.mkdir(os.path.join(tempdir, str(d)))
+        files = [os.path.join(tempdir, str(i % 100), 'file_{0}.txt'.format(i)) for i in range(number_of_files)]
+        for f in files:
+            open(f, 'w').close()
+        self.testdata.log(unit, 'Measuring memory of {0} files in the dict layout'.format(number_of_files))
+        tracemalloc.start()
+        dictlist = []
+        existingfiles = set()
+        for f in files:
+            fullname = os.path.basename(f)
+            base, ext = os.path.splitext(fullname)
+            existingfiles.add(f)
+            dictlist.append({
+                'fullname': fullname,
+                'base': base,
+                'ext': ext[1:],
+                'fullpath': f,
+                'dirpath': os.path.dirname(f)
+            })
+        dictsize = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del dictlist, existingfiles
+        self.testdata.log(unit, 'Memory in bytes: {0}'.format(dictsize))
+
+        self.testdata.log(unit, 'Measuring memory of {0} files in Files.list'.format(number_of_files))
+        tracemalloc.start()
+        filesobj = jabr.main.Files()
+        filesobj.add(files)
+        recordsize, peaksize = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        shutil.rmtree(tempdir)
+        self.assertEqual(len(filesobj.list), number_of_files)
+        self.testdata.log(unit, 'Memory in bytes: {0}, at the peak: {1}'.format(recordsize, peaksize))
+        self.assertLess(recordsize, dictsize / 2)
+        # No stat result is held past its file being added, the peak only
+        # adding the tuple of the files added that add returns
+        self.assertLess(peaksize, dictsize * 0.6)
+        self.testdata.log(unit, 'TESTING COMPLETE!')
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file